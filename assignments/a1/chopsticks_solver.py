@@ -0,0 +1,170 @@
+"""
+A solver for Chopsticks.
+
+The same hands can come back many times in a game of Chopsticks, so a
+search that follows moves can loop forever. Instead, every state is numbered
+with a small integer (the player to move and the four hands give
+2 * 5 ** 4 = 1250 states), and the states are labelled from the end of the
+game backwards: a state where the player to move has no moves is a loss,
+a state with a move to a loss is a win, a state whose moves all lead to wins
+is a loss, and every state left over is a draw, since neither player can
+force the game to end.
+"""
+
+from typing import List, Optional, Tuple
+from current_state import ChopsticksState
+
+NUM_STATES = 2 * 5 ** 4
+
+WIN = 'win'
+LOSS = 'loss'
+DRAW = 'draw'
+
+
+def encode(state: ChopsticksState) -> int:
+    """
+    Return the number of state, from 0 to NUM_STATES - 1.
+    >>> encode(ChopsticksState('p1', (1, 1), (1, 1)))
+    156
+    >>> encode(ChopsticksState('p2', (4, 4), (4, 4)))
+    1249
+    """
+    p1, p2 = state.get_hands()
+    code = ((p1[0] * 5 + p1[1]) * 5 + p2[0]) * 5 + p2[1]
+    if state.get_current_player_name() == 'p2':
+        code += 5 ** 4
+    return code
+
+
+def decode(code: int) -> ChopsticksState:
+    """
+    Return the state numbered code by encode.
+    >>> print(decode(156))
+    Player 1: 1 - 1; Player 2: 1 - 1
+    >>> decode(1249).get_current_player_name()
+    'p2'
+    """
+    player = 'p2' if code >= 5 ** 4 else 'p1'
+    code %= 5 ** 4
+    digits = [code // 125, code // 25 % 5, code // 5 % 5, code % 5]
+    return ChopsticksState(player, (digits[0], digits[1]),
+                           (digits[2], digits[3]))
+
+
+class ChopsticksSolver:
+    """
+    The value of every Chopsticks state with perfect play.
+
+    values - the value of each state for the player to move: WIN, LOSS or
+    DRAW, indexed by the number of the state
+    distances - the number of moves until the game ends from each state,
+    when the winner wins as fast as possible and the loser loses as slowly
+    as possible, or None for a draw
+    successors - the moves from each state and the numbers of the states
+    they lead to
+    """
+    values: List[str]
+    distances: List[Optional[int]]
+    successors: List[List[Tuple[str, int]]]
+
+    def __init__(self) -> None:
+        """
+        Initialize a ChopsticksSolver self by solving every state.
+        >>> solver = ChopsticksSolver()
+        >>> solver.values.count(WIN) + solver.values.count(LOSS) \\
+        ...     + solver.values.count(DRAW)
+        1250
+        """
+        self.successors = []
+        predecessors = [[] for _ in range(NUM_STATES)]
+        for code in range(NUM_STATES):
+            state = decode(code)
+            moves = [(move, encode(state.make_move(move)))
+                     for move in state.get_possible_moves()]
+            self.successors.append(moves)
+            for _, child in moves:
+                predecessors[child].append(code)
+        self.values = [DRAW] * NUM_STATES
+        self.distances = [None] * NUM_STATES
+        self._label(predecessors)
+
+    def _label(self, predecessors: List[List[int]]) -> None:
+        """
+        Label the states of self from the states with no moves backwards,
+        one distance at a time, so each state gets the fastest win or the
+        slowest loss.
+        """
+        # The number of moves from each state not yet known to be a win for
+        # the opponent.
+        unknown = [len(moves) for moves in self.successors]
+        queue = [code for code in range(NUM_STATES) if unknown[code] == 0]
+        for code in queue:
+            self.values[code] = LOSS
+            self.distances[code] = 0
+        for code in queue:
+            for parent in predecessors[code]:
+                if self.distances[parent] is not None:
+                    continue
+                if self.values[code] == LOSS:
+                    self.values[parent] = WIN
+                    self.distances[parent] = self.distances[code] + 1
+                    queue.append(parent)
+                else:
+                    unknown[parent] -= 1
+                    if unknown[parent] == 0:
+                        self.values[parent] = LOSS
+                        self.distances[parent] = self.distances[code] + 1
+                        queue.append(parent)
+
+    def value(self, state: ChopsticksState) -> str:
+        """
+        Return the value of state for the player to move.
+        >>> solver = ChopsticksSolver()
+        >>> solver.value(ChopsticksState('p1', (1, 1), (1, 1)))
+        'draw'
+        >>> solver.value(ChopsticksState('p1', (0, 0), (1, 1)))
+        'loss'
+        >>> solver.value(ChopsticksState('p1', (1, 4), (0, 1)))
+        'win'
+        """
+        return self.values[encode(state)]
+
+    def best_move(self, state: ChopsticksState) -> Optional[str]:
+        """
+        Return the move from state that wins as fast as possible, or keeps a
+        draw, or else loses as slowly as possible, or None if there are no
+        moves.
+        >>> solver = ChopsticksSolver()
+        >>> solver.best_move(ChopsticksState('p1', (1, 4), (0, 1)))
+        'rr'
+        """
+        best, best_rank = None, None
+        for move, child in self.successors[encode(state)]:
+            if self.values[child] == LOSS:
+                rank = (0, self.distances[child])
+            elif self.values[child] == DRAW:
+                rank = (1, 0)
+            else:
+                rank = (2, -self.distances[child])
+            if best_rank is None or rank < best_rank:
+                best, best_rank = move, rank
+        return best
+
+
+# The solver shared by get_solver, or None until it is first used.
+SOLVER: Optional[ChopsticksSolver] = None
+
+
+def get_solver() -> ChopsticksSolver:
+    """
+    Return the shared ChopsticksSolver, solving every state on first use.
+    """
+    global SOLVER
+    if SOLVER is None:
+        SOLVER = ChopsticksSolver()
+    return SOLVER
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config='a1_pyta.txt')
@@ -194,6 +194,15 @@ class ChopsticksState(CurrentState):
             new_state = ChopsticksState('p1', answer_oppo, self._p2)
         return new_state
 
+    def get_hands(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        Return the hands of player 1 and player 2.
+        >>> c = ChopsticksState('p1', (1, 2), (3, 4))
+        >>> c.get_hands()
+        ((1, 2), (3, 4))
+        """
+        return self._p1, self._p2
+
     def is_over(self) -> bool:
         """
         Return whether the Chopsticks game self is over.
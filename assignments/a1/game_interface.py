@@ -3,7 +3,7 @@ A module of game_interface. Complete the "TODOs" and reason about what
 classes you need to design to make this interface work.
 """
 from typing import Callable, Union
-from strategy1 import random_strategy, interactive_strategy
+from strategy1 import random_strategy, interactive_strategy, perfect_strategy
 from game1 import Game, SubtractSquare, Chopsticks
 
 # 's' should map to your implementation of Subtract Square, and 'c' should map
@@ -14,7 +14,8 @@ playable_games = {'s': SubtractSquare,
 # The strategies you are to implement.  See strategy.py, and then decide
 # how to modify this.
 usable_strategies = {'r': random_strategy,
-                     'i': interactive_strategy}
+                     'i': interactive_strategy,
+                     'p': perfect_strategy}
 
 
 class GameInterface:
@@ -1,6 +1,8 @@
 """strategies for player in game_interface"""
 
 from game1 import Game
+from current_state import ChopsticksState
+from chopsticks_solver import get_solver
 
 
 def interactive_strategy(game: Game) -> object:
@@ -19,6 +21,18 @@ def random_strategy(game: Game) -> object:
     return game.str_to_move(move)
 
 
+def perfect_strategy(game: Game) -> object:
+    """
+    Return a move for game that wins as fast as possible, or keeps a draw,
+    or else loses as slowly as possible, from the solved Chopsticks states.
+    Other games are played with random_strategy.
+    """
+    if not isinstance(game.current_state, ChopsticksState):
+        return random_strategy(game)
+    move = get_solver().best_move(game.current_state)
+    return game.str_to_move(move)
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config='a1_pyta.txt')
@@ -0,0 +1,99 @@
+"""
+Benchmarks for the strategies on a fixed set of positions.
+
+Run this module to print the results, e.g. python benchmark.py
+"""
+from time import perf_counter
+from typing import Callable, List, Tuple
+from game_state import GameState
+from stonehenge import StonehengeState, new_cells
+from subtract_square_state import SubtractSquareState
+from strategy import alphabeta_score, alphabeta_iterative_score, SearchStats
+from move_ordering import MoveOrderer
+from parallel_strategy import parallel_scores, shutdown_pool
+
+
+def stonehenge_position(size: int, moves: str) -> StonehengeState:
+    """
+    Return the StonehengeState of side length size, with p1 to start, after
+    each cell in moves is claimed in turn.
+
+    >>> stonehenge_position(2, 'AG').get_possible_moves()
+    [1, 2, 3, 4, 5]
+    """
+    state = StonehengeState(True, size, new_cells(size),
+                            [['@'] * (size + 1) for _ in range(3)])
+    for move in moves:
+        state = state.make_move(move)
+    return state
+
+
+# Positions that every strategy can solve exactly in a few seconds.
+POSITIONS = [('Stonehenge 2', stonehenge_position(2, '')),
+             ('Stonehenge 3 after ADG', stonehenge_position(3, 'ADG')),
+             ('Stonehenge 3 after BFK', stonehenge_position(3, 'BFK')),
+             ('Stonehenge 3 after EHJC', stonehenge_position(3, 'EHJC')),
+             ('Subtract Square 40', SubtractSquareState(True, 40))]
+
+
+def bench(name: str, search: Callable[[GameState], object],
+          positions: List[Tuple[str, GameState]] = None) -> float:
+    """
+    Print and return the seconds search takes over positions (POSITIONS if
+    positions is None), labelled with name.
+    """
+    if positions is None:
+        positions = POSITIONS
+    start = perf_counter()
+    for _, state in positions:
+        search(state)
+    elapsed = perf_counter() - start
+    print('{:<28} {:8.3f}s'.format(name, elapsed))
+    return elapsed
+
+
+def bench_parallel(worker_counts: Tuple[int, ...] = (1, 2, 4, 8)) -> dict:
+    """
+    Print and return the speedup of parallel_scores with each number of
+    workers in worker_counts over a serial alpha-beta search.
+
+    Each pool is warmed up before it is timed, as it would be after the
+    first turn of a game.
+    """
+    serial = bench('serial alpha-beta',
+                   lambda state: alphabeta_score(state, GameState.LOSE - 1,
+                                                 GameState.WIN + 1))
+    speedups = {}
+    for workers in worker_counts:
+        parallel_scores(POSITIONS[0][1], workers)
+        elapsed = bench('root-parallel, {} workers'.format(workers),
+                        lambda state, n=workers: parallel_scores(state, n))
+        speedups[workers] = serial / elapsed
+        print('{:<28} {:8.2f}x'.format('speedup', speedups[workers]))
+    shutdown_pool()
+    return speedups
+
+
+def bench_ordering() -> dict:
+    """
+    Print and return the number of states each alpha-beta search visits on
+    POSITIONS without and with a MoveOrderer.
+    """
+    nodes = {}
+    for search in (alphabeta_score, alphabeta_iterative_score):
+        for orderer_class in (None, MoveOrderer):
+            stats = SearchStats()
+            for _, state in POSITIONS:
+                orderer = None if orderer_class is None else orderer_class()
+                search(state, GameState.LOSE - 1, GameState.WIN + 1, stats,
+                       orderer)
+            name = '{}, {}'.format(search.__name__, 'ordered' if orderer_class
+                                   else 'unordered')
+            nodes[name] = stats.nodes
+            print('{:<42} {:10d} nodes'.format(name, stats.nodes))
+    return nodes
+
+
+if __name__ == "__main__":
+    bench_ordering()
+    bench_parallel()
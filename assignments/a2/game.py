@@ -43,6 +43,13 @@ class Game:
         """
         raise NotImplementedError
 
+    def move_to_str(self, move: Any) -> str:
+        """
+        Return the string that represents move to a player, which
+        str_to_move turns back into move.
+        """
+        return str(move)
+
 
 if __name__ == "__main__":
     from python_ta import check_all
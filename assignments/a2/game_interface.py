@@ -13,11 +13,17 @@ from strategy import *
 from typing import Any, Callable
 from subtract_square_game import SubtractSquareGame
 from stonehenge import StonehengeGame
+from stonehenge_bitboard import BitboardStonehengeGame
+from parallel_strategy import parallel_strategy
+from mcts import mcts_strategy
+from tablebase import tablebase_strategy
+from subtract_square_solver import solver_strategy
 
 # TODO: Replace None with the corresponding class name for your games.
 # 'h' should map to Stonehenge.
 playable_games = {'s': SubtractSquareGame,
-                  'h': StonehengeGame}
+                  'h': StonehengeGame,
+                  'b': BitboardStonehengeGame}
 
 # TODO: Replace None with the corresponding function names for your strategies.
 # 'mr' should map to your recursive implementation of minimax while
@@ -25,7 +31,14 @@ playable_games = {'s': SubtractSquareGame,
 usable_strategies = {'i': interactive_strategy,
                      'ro': rough_outcome_strategy,
                      'mr': recursive_strategy,
-                     'mi': iterative_strategy}
+                     'mi': iterative_strategy,
+                     'ar': alphabeta_recursive_strategy,
+                     'ai': alphabeta_iterative_strategy,
+                     'id': iterative_deepening_strategy,
+                     'mp': parallel_strategy,
+                     'mc': mcts_strategy,
+                     'tb': tablebase_strategy,
+                     'dp': solver_strategy}
 
 
 class GameInterface:
@@ -71,10 +84,10 @@ class GameInterface:
             move_to_make = None
 
             # Print out all of the valid moves
-            possible_moves = current_state.get_possible_moves()
+            possible_moves = current_state.cached_moves()
             print("The current available moves are:")
             for move in possible_moves:
-                print(move)
+                print(self.game.move_to_str(move))
 
             # Pick a (legal) move.
             while not current_state.is_valid_move(move_to_make):
@@ -90,7 +103,7 @@ class GameInterface:
             current_state = self.game.current_state
 
             print("{} made the move {}. The game's state is now:".format(
-                current_player_name, move_to_make))
+                current_player_name, self.game.move_to_str(move_to_make)))
             print(current_state)
 
         # Print out the winner of the game
@@ -3,7 +3,7 @@ The GameState superclass.
 
 NOTE: You do not have to run python-ta on this file.
 """
-from typing import Any
+from typing import Any, Optional, Tuple
 
 
 class GameState:
@@ -27,6 +27,8 @@ class GameState:
 
         """
         self.p1_turn = is_p1_turn
+        self._moves = None
+        self._move_set = None
 
     def __str__(self) -> str:
         """
@@ -39,6 +41,43 @@ class GameState:
         """
         raise NotImplementedError
 
+    def cached_moves(self) -> list:
+        """
+        Return all possible moves that can be applied to this state. They
+        are found by get_possible_moves the first time and then kept, so the
+        list is shared and must not be changed.
+        """
+        if self._moves is None:
+            self._moves = self.get_possible_moves()
+        return self._moves
+
+    def move_set(self) -> frozenset:
+        """
+        Return the possible moves of this state as a frozenset, which is
+        also kept, for fast membership tests.
+        """
+        if self._move_set is None:
+            self._move_set = frozenset(self.cached_moves())
+        return self._move_set
+
+    def forget_moves(self) -> Tuple[Optional[list], Optional[frozenset]]:
+        """
+        Forget the kept possible moves of this state, which apply_move must
+        do when it changes it, and return them so that undo_move can put
+        them back with restore_moves.
+        """
+        kept = self._moves, self._move_set
+        self._moves = None
+        self._move_set = None
+        return kept
+
+    def restore_moves(self, kept: Tuple[Optional[list],
+                                        Optional[frozenset]]) -> None:
+        """
+        Keep the possible moves in kept, as returned by forget_moves, again.
+        """
+        self._moves, self._move_set = kept
+
     def get_current_player_name(self) -> str:
         """
         Return 'p1' if the current player is Player 1, and 'p2' if the current
@@ -48,17 +87,76 @@ class GameState:
             return 'p1'
         return 'p2'
 
+    def is_over(self) -> bool:
+        """
+        Return whether or not the game is over at this state.
+        """
+        raise NotImplementedError
+
+    def is_winner(self, player: str) -> bool:
+        """
+        Return whether player has won the game at this state.
+
+        Precondition: player is 'p1' or 'p2'.
+        """
+        raise NotImplementedError
+
+    def terminal_score(self) -> Optional[int]:
+        """
+        Return the score of the current player (WIN, LOSE or DRAW) if the
+        game is over at this state, otherwise None. Games where the player
+        who made the last move always wins can answer this from is_over()
+        alone.
+        """
+        if not self.is_over():
+            return None
+        player = self.get_current_player_name()
+        opponent = 'p1' if player == 'p2' else 'p2'
+        if self.is_winner(player):
+            return self.WIN
+        elif self.is_winner(opponent):
+            return self.LOSE
+        return self.DRAW
+
     def make_move(self, move: Any) -> 'GameState':
         """
         Return the GameState that results from applying move to this GameState.
         """
         raise NotImplementedError
 
+    def apply_move(self, move: Any) -> Any:
+        """
+        Apply the valid move to this GameState in place, and return what
+        undo_move needs to take it back, which is never None. The kept
+        possible moves are forgotten, and put back by undo_move. Searches use
+        apply_move and undo_move instead of make_move when a game implements
+        them, so one state is reused instead of creating a new state for
+        every move.
+
+        Games that do not support this raise NotImplementedError.
+        """
+        raise NotImplementedError
+
+    def undo_move(self, undo: Any) -> None:
+        """
+        Take back the most recent move applied to this GameState, where undo
+        is what apply_move returned for it.
+        """
+        raise NotImplementedError
+
     def is_valid_move(self, move: Any) -> bool:
         """
         Return whether move is a valid move for this GameState.
         """
-        return move in self.get_possible_moves()
+        return move in self.move_set()
+
+    def immediate_gain(self, move: Any) -> int:
+        """
+        Return a cheap estimate of how much the current player gains by
+        applying move, used to try promising moves first. Moves with no
+        immediate effect gain 0.
+        """
+        return 0
 
     def __repr__(self) -> Any:
         """
@@ -67,6 +165,35 @@ class GameState:
         """
         raise NotImplementedError
 
+    def state_key(self) -> Any:
+        """
+        Return a hashable key that is equal for two states iff they have the
+        same position and the same current player.
+        """
+        raise NotImplementedError
+
+    def canonical_key(self) -> Any:
+        """
+        Return a hashable key that is equal for two states iff they are the
+        same up to a symmetry of the game, so caches can keep one entry for
+        all of them. Games with no symmetries use state_key().
+        """
+        return self.state_key()
+
+    def pack(self) -> int:
+        """
+        Return this state packed into a single int, which is cheap to send to
+        other processes or to store. unpack(pack()) gives an equal state.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def unpack(cls, packed: int) -> 'GameState':
+        """
+        Return the state that was packed into packed by pack().
+        """
+        raise NotImplementedError
+
     def rough_outcome(self) -> float:
         """
         Return an estimate in interval [LOSE, WIN] of best outcome the current
@@ -0,0 +1,220 @@
+"""
+A Monte Carlo tree search (UCT) strategy, for boards too large for minimax.
+
+Instead of searching every move, the search plays many random games
+(playouts) from the current state, and spends more of them on the moves
+that have done well so far.
+"""
+from math import log, sqrt
+from random import choice
+from time import monotonic
+from typing import Any, List, Optional
+from game import Game
+from game_state import GameState
+from strategy import over_score
+
+# The number of playouts mcts_strategy runs per move.
+PLAYOUTS = 2000
+# Seconds mcts_strategy may spend per move, or None for no time limit.
+TIME_BUDGET = None
+# How much the search favours rarely played moves over well scoring ones.
+EXPLORATION = sqrt(2)
+
+
+class MCTSNode:
+    """
+    A state in the tree of a MonteCarloTreeSearch.
+
+    state - the GameState at this node
+    move - the move that leads to state from the parent's state
+    parent - the node this node was reached from, or None for the root
+    children - the nodes reached by the moves tried so far
+    untried - the moves from state that have no child yet
+    visits - the number of playouts that passed through this node
+    total - the sum of the scores of those playouts, for the player who made
+            move
+    """
+    state: GameState
+    move: Any
+    parent: Optional['MCTSNode']
+    children: List['MCTSNode']
+    untried: list
+    visits: int
+    total: float
+
+    def __init__(self, state: GameState, move: Any = None,
+                 parent: Optional['MCTSNode'] = None) -> None:
+        """
+        Initialize an MCTSNode self for state, reached by move from parent.
+        """
+        self.state = state
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = [] if state.is_over() else list(state.cached_moves())
+        self.visits = 0
+        self.total = 0.0
+
+    def uct(self, exploration: float) -> float:
+        """
+        Return the upper confidence bound used to choose between self and
+        its siblings.
+
+        Precondition: self has been visited and has a parent.
+        """
+        return (self.total / self.visits
+                + exploration * sqrt(log(self.parent.visits) / self.visits))
+
+    def select_child(self, exploration: float) -> 'MCTSNode':
+        """
+        Return the child of self with the highest upper confidence bound.
+        """
+        return max(self.children, key=lambda child: child.uct(exploration))
+
+    def expand(self) -> 'MCTSNode':
+        """
+        Add and return the child of self for one of its untried moves.
+        """
+        move = self.untried.pop()
+        child = MCTSNode(self.state.make_move(move), move, self)
+        self.children.append(child)
+        return child
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of self.
+        """
+        r = '[{}; {} visits; {:.3f} average]'
+        return r.format(self.move, self.visits,
+                        self.total / self.visits if self.visits else 0.0)
+
+
+class MonteCarloTreeSearch:
+    """
+    A Monte Carlo tree search that keeps its tree between turns.
+
+    root - the node for the state searched last, or None
+    exploration - the exploration constant of the upper confidence bound
+    playouts - the number of playouts run by the last search
+    elapsed - the seconds taken by the last search
+    reused - the number of playouts the last search reused from the
+             previous one
+    """
+    root: Optional[MCTSNode]
+    exploration: float
+    playouts: int
+    elapsed: float
+    reused: int
+
+    def __init__(self, exploration: float = EXPLORATION) -> None:
+        """
+        Initialize a MonteCarloTreeSearch self with an empty tree.
+        """
+        self.root = None
+        self.exploration = exploration
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.reused = 0
+
+    def advance(self, state: GameState) -> MCTSNode:
+        """
+        Make the node for state the root of self's tree and return it. If
+        state is reached from the old root by one or two moves (usually our
+        move followed by the opponent's reply), that part of the tree is kept.
+        """
+        key = state.state_key()
+        candidates = [] if self.root is None else [self.root]
+        for _ in range(3):
+            for node in candidates:
+                if node.state.state_key() == key:
+                    node.parent = None
+                    self.root = node
+                    return node
+            candidates = [child for node in candidates
+                          for child in node.children]
+        self.root = MCTSNode(state)
+        return self.root
+
+    def search(self, state: GameState, playouts: Optional[int] = PLAYOUTS,
+               time_budget: Optional[float] = None) -> Any:
+        """
+        Return the move from state that was played most often after running
+        playouts playouts, or as many as fit in time_budget seconds. At least
+        one of playouts and time_budget must not be None. If no move from
+        state has been tried yet, one playout is run regardless, so there is
+        always a move to return.
+
+        Precondition: the game is not over at state.
+        """
+        start = monotonic()
+        root = self.advance(state)
+        self.reused = root.visits
+        self.playouts = 0
+        while (root.children == []
+               or ((playouts is None or self.playouts < playouts)
+                   and (time_budget is None
+                        or monotonic() - start < time_budget))):
+            self.run_playout(root)
+            self.playouts += 1
+        self.elapsed = monotonic() - start
+        return max(root.children, key=lambda child: child.visits).move
+
+    def run_playout(self, root: MCTSNode) -> None:
+        """
+        Choose a path down the tree from root, add one node to it, play a
+        random game from that node and record its result along the path.
+        """
+        node = root
+        while node.untried == [] and node.children != []:
+            node = node.select_child(self.exploration)
+        if node.untried != []:
+            node = node.expand()
+        state = node.state
+        while not state.is_over():
+            state = state.make_move(choice(state.cached_moves()))
+        # The score for the player who made node.move, who is not the
+        # current player of node.state.
+        score = over_score(state)
+        if state.p1_turn == node.state.p1_turn:
+            score = -1 * score
+        while node is not None:
+            node.visits += 1
+            node.total += score
+            score = -1 * score
+            node = node.parent
+
+    def playouts_per_second(self) -> float:
+        """
+        Return the number of playouts per second in the last search.
+        """
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of self.
+
+        >>> print(MonteCarloTreeSearch())
+        MonteCarloTreeSearch: 0 playouts (0 reused) at 0 playouts per second
+        """
+        r = 'MonteCarloTreeSearch: {} playouts ({} reused) at {:.0f} ' \
+            'playouts per second'
+        return r.format(self.playouts, self.reused,
+                        self.playouts_per_second())
+
+
+# The search used by mcts_strategy, which keeps its tree between turns.
+MCTS = MonteCarloTreeSearch()
+
+
+def mcts_strategy(game: Game) -> Any:
+    """
+    Return a move for game chosen by a Monte Carlo tree search with PLAYOUTS
+    playouts, limited to TIME_BUDGET seconds.
+    """
+    move = MCTS.search(game.current_state, PLAYOUTS, TIME_BUDGET)
+    return move
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
@@ -0,0 +1,79 @@
+"""
+Move ordering for the searches with pruning in strategy.py.
+
+Alpha-beta pruning skips the most moves when the best move is searched
+first, so the searches ask a MoveOrderer which moves to try first.
+"""
+from typing import Any, Dict, List
+from game_state import GameState
+
+
+class MoveOrderer:
+    """
+    Ranks the moves of a state: first the moves that claim something right
+    away (see GameState.immediate_gain), then the killer moves that caused a
+    cutoff at the same ply, then the moves with the most cutoffs elsewhere,
+    then the rest in the order of get_possible_moves().
+
+    killers - a dictionary from each ply (the number of moves from the root)
+              to the last two moves that caused a cutoff at that ply
+    history - a dictionary from each move to the total weight of the
+              cutoffs it caused
+    """
+    killers: Dict[int, list]
+    history: Dict[Any, int]
+
+    def __init__(self) -> None:
+        """
+        Initialize a MoveOrderer self with no cutoffs recorded.
+        """
+        self.killers = {}
+        self.history = {}
+
+    def order(self, state: GameState, moves: list, ply: int) -> List[Any]:
+        """
+        Return moves from state, at ply moves from the root, sorted from the
+        most to the least promising.
+
+        >>> from subtract_square_state import SubtractSquareState
+        >>> orderer = MoveOrderer()
+        >>> state = SubtractSquareState(True, 9)
+        >>> orderer.order(state, state.get_possible_moves(), 0)
+        [9, 1, 4]
+        >>> orderer.record_cutoff(4, 0)
+        >>> orderer.order(state, state.get_possible_moves(), 0)
+        [9, 4, 1]
+        """
+        killers = self.killers.get(ply, [])
+
+        def rank(move: Any) -> tuple:
+            """
+            Return a key that sorts move before less promising moves.
+            """
+            killer = killers.index(move) if move in killers else len(killers)
+            return (-1 * state.immediate_gain(move), killer,
+                    -1 * self.history.get(move, 0))
+        return sorted(moves, key=rank)
+
+    def record_cutoff(self, move: Any, ply: int, weight: int = 1) -> None:
+        """
+        Record that move caused a cutoff at ply, adding weight to its
+        history.
+
+        >>> orderer = MoveOrderer()
+        >>> for move in ['A', 'B', 'C', 'B']:
+        ...     orderer.record_cutoff(move, 3)
+        >>> orderer.killers[3], orderer.history['B']
+        (['B', 'C'], 2)
+        """
+        killers = self.killers.setdefault(ply, [])
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[2:]
+        self.history[move] = self.history.get(move, 0) + weight
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
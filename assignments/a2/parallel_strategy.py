@@ -0,0 +1,89 @@
+"""
+A root-parallel minimax strategy: the moves of a game's current state are
+scored at the same time by a pool of worker processes.
+
+The pool is started on first use and kept alive between turns, so only the
+first move pays for starting the workers.
+"""
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+from game import Game
+from game_state import GameState
+from strategy import alphabeta_score, choose_random_move
+
+# The number of worker processes, or None for one per CPU.
+WORKERS = None
+
+_pool = None
+_pool_workers = None
+
+
+def get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Return the shared pool of worker processes, starting it if needed. If
+    the pool is running with a different number of workers, it is restarted
+    with workers processes.
+    """
+    global _pool, _pool_workers
+    if _pool is not None and _pool_workers != workers:
+        shutdown_pool()
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+        atexit.register(shutdown_pool)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """
+    Stop the worker processes of the shared pool, if it is running.
+    """
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+        atexit.unregister(shutdown_pool)
+    _pool, _pool_workers = None, None
+
+
+def score_packed(state_class: type, packed: int) -> int:
+    """
+    Return the highest guaranteed score for the current player of the
+    state_class state packed into packed. This runs in a worker process.
+    """
+    state = state_class.unpack(packed)
+    return alphabeta_score(state, GameState.LOSE - 1, GameState.WIN + 1)
+
+
+def parallel_scores(state: GameState, workers: Optional[int] = None) -> dict:
+    """
+    Return a dictionary from each move from state to the highest guaranteed
+    score of that move for the current player, searching the state after
+    each move in a separate task of the shared pool.
+    """
+    pool = get_pool(workers)
+    futures = {}
+    for move in state.cached_moves():
+        child = state.make_move(move)
+        futures[move] = pool.submit(score_packed, type(child), child.pack())
+    return {move: -1 * futures[move].result() for move in futures}
+
+
+def parallel_strategy(game: Game, workers: Optional[int] = None) -> Any:
+    """
+    Return a move for game that produces a "highest guaranteed score" for the
+    current player, scoring the moves in parallel with workers processes
+    (WORKERS if workers is None).
+    """
+    if workers is None:
+        workers = WORKERS
+    scores = parallel_scores(game.current_state, workers)
+    best = max(scores.values())
+    move = choose_random_move([move for move in scores
+                               if scores[move] == best])
+    return move
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
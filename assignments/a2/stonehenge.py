@@ -1,10 +1,15 @@
 """
 An implementation of game stonehenge.
 """
-from typing import Any, List, Union
-from copy import deepcopy
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, \
+    Union
 from game import Game
 from game_state import GameState
+from stonehenge_geometry import symmetries, map_cell, cell_lines, \
+    cell_numbers, cell_positions, ley_lines, line_lengths, cell_line_masks, \
+    popcount
+from zobrist import zobrist_hashes, update_hashes
 
 
 class StonehengeGame(Game):
@@ -31,19 +36,7 @@ class StonehengeGame(Game):
         Return a cell list generated according to size. The cell list is used
         when initizing a new StonehengeGame.
         """
-        alpha_list = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K',
-                      'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V',
-                      'W', 'X', 'Y', 'Z']
-        start, end = 0, 1
-        result = []
-        for i in range(2, size + 2):
-            line = alpha_list[start: end + 1]
-            result.append(line)
-            start = end + 1
-            end = start + i
-        last_line = alpha_list[start: start + size]
-        result.append(last_line)
-        return result
+        return new_cells(size)
 
     def get_instructions(self) -> str:
         """
@@ -61,7 +54,7 @@ class StonehengeGame(Game):
         Return whether or not this StonehengeGame is over at this
         StonehengeState.
         """
-        return state.get_possible_moves() == []
+        return state.is_over()
 
     def is_winner(self, player: str) -> bool:
         """
@@ -69,16 +62,27 @@ class StonehengeGame(Game):
 
         Precondition: player is 'p1' or 'p2'.
         """
-        return (self.current_state.get_current_player_name() != player
-                and self.is_over(self.current_state))
+        return self.current_state.is_winner(player)
+
+    def str_to_move(self, string: str) -> int:
+        """
+        Return the move that string represents: the number of the cell (see
+        stonehenge_geometry) it labels. If string is not a move, return some
+        invalid move.
+        :param string: Is a move when it is the label of an unclaimed cell
+                       ("A", "B", ..., "AA", etc)
+        """
+        position = locate(self.current_state.size, string)
+        if (position is None
+                or not self.current_state.is_valid_move(position[2])):
+            return -1
+        return position[2]
 
-    def str_to_move(self, string: str) -> str:
+    def move_to_str(self, move: int) -> str:
         """
-        Return the move that string represents. If string is not a move,
-        return some invalid move.
-        :param string: Is a move when it is a capital letter("A", "B", etc)
+        Return the label of the cell numbered move.
         """
-        return string if self.current_state.is_valid_move(string) else '-1'
+        return cell_label(move)
 
     def __eq__(self, other: Any) -> bool:
         """
@@ -95,32 +99,301 @@ class StonehengeGame(Game):
         return r.format(self.current_state.size)
 
 
+def new_cells(size: int) -> List[List[str]]:
+    """
+    Return the lines of cells of a new Stonehenge board with side length
+    size.
+
+    >>> new_cells(2)
+    [['A', 'B'], ['C', 'D', 'E'], ['F', 'G']]
+    >>> new_cells(6)[-1]
+    ['AB', 'AC', 'AD', 'AE', 'AF', 'AG']
+    """
+    return [[cell_label(cell) for cell in line]
+            for line in cell_numbers(size)]
+
+
+def cell_label(cell: int) -> str:
+    """
+    Return the label of the cell numbered cell (see stonehenge_geometry):
+    'A' to 'Z', then 'AA', 'AB', ..., 'AZ', 'BA', ... like the columns of a
+    spreadsheet, so boards of any size have a label for every cell.
+
+    >>> [cell_label(cell) for cell in (0, 25, 26, 51, 52)]
+    ['A', 'Z', 'AA', 'AZ', 'BA']
+    """
+    label = ''
+    cell += 1
+    while cell > 0:
+        cell, letter = divmod(cell - 1, 26)
+        label = chr(ord('A') + letter) + label
+    return label
+
+
+@lru_cache(maxsize=None)
+def cell_locations(size: int) -> Tuple[Tuple[int, int, int], ...]:
+    """
+    Return the index of the line of cells, the index in that line and the
+    number of each cell of a board with side length size, in the order of
+    the cell numbers (see stonehenge_geometry). All the states of a size
+    share it.
+
+    >>> cell_locations(1)
+    ((0, 0, 0), (0, 1, 1), (1, 0, 2))
+    """
+    return tuple(position + (cell,)
+                 for cell, position in enumerate(cell_positions(size)))
+
+
+@lru_cache(maxsize=None)
+def label_index(size: int) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Return a dictionary from the label of each cell of a board with side
+    length size to its location, as in cell_locations.
+
+    >>> label_index(2)['D']
+    (1, 1, 3)
+    """
+    return {cell_label(location[2]): location
+            for location in cell_locations(size)}
+
+
+def locate(size: int, move: Any) -> Optional[Tuple[int, int, int]]:
+    """
+    Return the index of the line of cells, the index in that line and the
+    number of the cell that move names on a board with side length size, or
+    None if move names no cell. A move is the number of a cell (see
+    stonehenge_geometry); the label of a cell, as typed by a player, is also
+    accepted and looked up.
+
+    >>> locate(2, 'D'), locate(2, 3), locate(2, 7)
+    ((1, 1, 3), (1, 1, 3), None)
+    """
+    if type(move) == int:
+        locations = cell_locations(size)
+        return locations[move] if 0 <= move < len(locations) else None
+    return label_index(size).get(move)
+
+
+def line_bits(mask: int) -> List[int]:
+    """
+    Return the numbers of the bits set in mask, in increasing order.
+
+    >>> line_bits(0b10110)
+    [1, 2, 4]
+    """
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+def best_gain(size: int, threats: int,
+              is_free: Callable[[int], bool]) -> int:
+    """
+    Return the most of the ley-lines in the bitmask threats that claiming
+    one cell captures on a board with side length size, where is_free tells
+    whether a cell is unclaimed. Only the cells of those ley-lines are
+    looked at.
+    """
+    best = 0
+    through = cell_line_masks(size)
+    for line in line_bits(threats):
+        for cell in ley_lines(size)[line]:
+            if is_free(cell):
+                best = max(best, popcount(threats & through[cell]))
+    return best
+
+
+def threat_outcome(size: int, owned: Tuple[int, int],
+                   threats: Tuple[int, int],
+                   is_free: Callable[[int], bool]) -> float:
+    """
+    Return WIN if the current player can claim half of the ley-lines with
+    one move, LOSE if the opponent can do so after every move of the current
+    player and DRAW otherwise, on a board with side length size that is not
+    over. owned is the number of ley-lines the current player and the
+    opponent have claimed, threats the bitmasks of the unclaimed ley-lines
+    each would capture with one more cell, and is_free tells whether a cell
+    is unclaimed.
+
+    Only the cells of threatened ley-lines are looked at, so this is far
+    cheaper than trying every move and every reply.
+    """
+    half = 3 * (size + 1) / 2
+    if owned[0] + best_gain(size, threats[0], is_free) >= half:
+        return GameState.WIN
+    target = half - owned[1]
+    through = cell_line_masks(size)
+    # The cells that win for the opponent, and how many ley-lines each
+    # captures.
+    winning = {}
+    for line in line_bits(threats[1]):
+        for cell in ley_lines(size)[line]:
+            if cell not in winning and is_free(cell):
+                gain = popcount(threats[1] & through[cell])
+                if gain >= target:
+                    winning[cell] = gain
+    if winning == {}:
+        return GameState.DRAW
+    # A move on a ley-line both players threaten captures it first, so the
+    # only moves that can stop the opponent are on a winning cell or on such
+    # a ley-line through one.
+    both = threats[0] & threats[1]
+    blockers = set(winning)
+    for cell in winning:
+        for line in line_bits(both & through[cell]):
+            blockers.update(other for other in ley_lines(size)[line]
+                            if is_free(other))
+    for blocker in blockers:
+        if not any(cell != blocker
+                   and gain - popcount(both & through[blocker]
+                                       & through[cell]) >= target
+                   for cell, gain in winning.items()):
+            return GameState.DRAW
+    return GameState.LOSE
+
+
+# The first of the characters that stand in for the cells and markers of a
+# board with labels longer than one character while it is drawn.
+FIRST_PLACEHOLDER = 0xe000
+
+# The 2-bit codes used by StonehengeState.pack for cells and markers.
+PACK_CODES = {'1': 1, '2': 2}
+PACK_SYMBOLS = {1: '1', 2: '2'}
+
+
 class StonehengeState(GameState):
     """
     The state of a StonehengeGame at a certain point in time.
-    """
 
-    def __init__(self, is_p1_turn: bool, size: int, cells: List[List[str]],
-                 ley_line_markers: List[List[str]]) -> None:
+    The cells and ley-line markers are stored as tuples, so a state made by
+    make_move shares every line of cells and group of markers that the move
+    did not change with its parent.
+
+    cells - the lines of cells, each cell showing its label until it is
+            claimed and then the number of the player who claimed it
+    ley_line_markers - the horizontal, diagonal-right and diagonal-left
+                       groups of ley-line markers, each '@' until it is
+                       claimed and then the number of the player who
+                       claimed it
+    zobrist - the 64-bit Zobrist hash of this state in each symmetric frame
+              of the board (see zobrist.py); zobrist[0] is the hash of this
+              state as it is
+    line_counts - the number of cells of each ley-line (numbered as in
+                  stonehenge_geometry) claimed by player 1, and by player 2
+    lines_claimed - the number of ley-lines claimed by player 1, and by
+                    player 2
+    threats - bitmasks of the unclaimed ley-lines (ley-line i is bit i) that
+              player 1, and player 2, would capture by claiming one more of
+              their cells
+    free_cells - the number of cells not claimed yet
+    """
+    cells: Tuple[Tuple[str, ...], ...]
+    ley_line_markers: Tuple[Tuple[str, ...], ...]
+    zobrist: Tuple[int, ...]
+    line_counts: Tuple[Tuple[int, ...], Tuple[int, ...]]
+    lines_claimed: Tuple[int, int]
+    threats: Tuple[int, int]
+    free_cells: int
+
+    def __init__(self, is_p1_turn: bool, size: int,
+                 cells: Sequence[Sequence[str]],
+                 ley_line_markers: Sequence[Sequence[str]],
+                 zobrist: Optional[Tuple[int, ...]] = None,
+                 line_counts: Optional[Tuple[Tuple[int, ...],
+                                             Tuple[int, ...]]] = None,
+                 lines_claimed: Optional[Tuple[int, int]] = None,
+                 threats: Optional[Tuple[int, int]] = None,
+                 free_cells: Optional[int] = None) -> None:
         """
         Initialize this Stonehengestate and set the current player based on
-        is_p1_turn.
+        is_p1_turn. The Zobrist hashes, ley-line counts, numbers of claimed
+        ley-lines, threats and number of free cells are computed from the
+        cells and markers unless they are given.
         Extends GameState.__init__
         """
         GameState.__init__(self, is_p1_turn)
         self.size = size
-        self.cells = cells
-        self.ley_line_markers = ley_line_markers
+        # tuple() returns a tuple as it is, so the shared lines of a state
+        # made by make_move are not copied.
+        self.cells = tuple(map(tuple, cells))
+        self.ley_line_markers = tuple(map(tuple, ley_line_markers))
+        if zobrist is None:
+            zobrist = zobrist_hashes(size, is_p1_turn, self.symbols())
+        self.zobrist = zobrist
+        if line_counts is None:
+            flat = self.symbols()
+            line_counts = tuple(
+                tuple(sum(1 for cell in line if flat[cell] == player)
+                      for line in ley_lines(size)) for player in '12')
+        self.line_counts = line_counts
+        if lines_claimed is None:
+            lines_claimed = tuple(sum(group.count(player)
+                                      for group in self.ley_line_markers)
+                                  for player in '12')
+        self.lines_claimed = lines_claimed
+        if threats is None:
+            free = [marker == '@' for group in self.ley_line_markers
+                    for marker in group]
+            threats = tuple(
+                sum(1 << line for line, length
+                    in enumerate(line_lengths(size))
+                    if free[line] and 2 * (counts[line] + 1) >= length)
+                for counts in self.line_counts)
+        self.threats = threats
+        if free_cells is None:
+            free_cells = sum(1 for line in self.cells for cell in line
+                             if cell not in ('1', '2'))
+        self.free_cells = free_cells
+
+    def symbols(self) -> List[str]:
+        """
+        Return the cells and then the ley-line markers of this state, in the
+        order used by stonehenge_geometry.
+        """
+        return [symbol for line in self.cells + self.ley_line_markers
+                for symbol in line]
 
     def __str__(self) -> str:
         """
         Return a string representation of the current state of the
         StonehengeGame.
         """
-        cells_n_dashes = self.insert_dash(self.cells)
+        symbols = self.symbols()
+        width = max(len(symbol) for symbol in symbols)
+        if width == 1:
+            return self.draw(self.cells, self.ley_line_markers)
+        # The board is drawn for one character per cell and marker, so each
+        # is drawn as a placeholder character first, and then every column
+        # that can hold one is widened to fit the widest label.
+        placeholders = {chr(FIRST_PLACEHOLDER + position): symbol
+                        for position, symbol in enumerate(symbols)}
+        keys = list(placeholders)
+        cells = [keys[line[0]:line[-1] + 1]
+                 for line in cell_numbers(self.size)]
+        first_marker = len(cell_positions(self.size))
+        markers = [keys[first_marker + group * (self.size + 1):
+                        first_marker + (group + 1) * (self.size + 1)]
+                   for group in range(3)]
+        board = self.draw(cells, markers).split('\n')
+        return '\n'.join(''.join(
+            placeholders.get(char, char).center(width) if column % 2 == 0
+            else char for column, char in enumerate(line)).rstrip()
+                         for line in board)
+
+    def draw(self, cells: Sequence[Sequence[str]],
+             markers: Sequence[Sequence[str]]) -> str:
+        """
+        Return the board of this state with the one-character cells and
+        ley-line markers given.
+        """
+        cells_n_dashes = self.insert_dash(cells)
         slashes = self.generate_slash()
         board = self.generate_board(cells_n_dashes, slashes)
-        self.add_markers(board)
+        self.add_markers(board, markers)
         self.add_space(board)
         sum_board = '\n'.join(board)
         return sum_board
@@ -160,30 +433,34 @@ class StonehengeState(GameState):
         """
         return add_between(slashes, cells_n_dashes)
 
-    def add_markers(self, pre_board: List[str]) -> None:
+    def add_markers(self, pre_board: List[str],
+                    markers: Optional[Sequence[Sequence[str]]] = None) \
+            -> None:
         """
-        Insert ley-line markers into pre_board.
+        Insert the ley-line markers of this state, or markers if given, into
+        pre_board.
         """
+        if markers is None:
+            markers = self.ley_line_markers
         # from top to bottom
-        first_line = '{}   {}'.format(self.ley_line_markers[2][0],
-                                      self.ley_line_markers[2][1])
+        first_line = '{}   {}'.format(markers[2][0], markers[2][1])
         for i in range(len(pre_board)):
             if i % 2 == 1 and i < len(pre_board) - 4:
                 pre_board[i] = ' ' * abs(len(pre_board) - 4 - i) + \
-                 '{} - '.format(self.ley_line_markers[0][int((i - 1) / 2)]) + \
+                 '{} - '.format(markers[0][int((i - 1) / 2)]) + \
                  pre_board[i] + \
-                 '   {}'.format(self.ley_line_markers[2][int((i + 3) / 2)])
+                 '   {}'.format(markers[2][int((i + 3) / 2)])
             elif i % 2 == 1 and i == len(pre_board) - 4:
                 pre_board[i] = \
-                 '{} - '.format(self.ley_line_markers[0][int((i - 1) / 2)]) + \
+                 '{} - '.format(markers[0][int((i - 1) / 2)]) + \
                  pre_board[i]
             elif i == len(pre_board) - 2:
                 pre_board[i] = ' ' * abs(len(pre_board) - 4 - i) + \
-                 '{} - '.format(self.ley_line_markers[0][int((i - 1) / 2)]) + \
+                 '{} - '.format(markers[0][int((i - 1) / 2)]) + \
                  pre_board[i] + \
-                 '   {}'.format(self.ley_line_markers[1][-1])
+                 '   {}'.format(markers[1][-1])
 
-        pre_last_line = '   '.join(self.ley_line_markers[1][:-1])
+        pre_last_line = '   '.join(markers[1][:-1])
         last_line = '        ' + pre_last_line
         pre_board.insert(0, first_line)
         pre_board.append(last_line)
@@ -199,146 +476,183 @@ class StonehengeState(GameState):
                             board[i]
         board[0] = '     ' + ' ' * abs(len(board) - 6) + board[0]
 
-    def get_possible_moves(self) -> List[str]:
+    def get_possible_moves(self) -> List[int]:
         """
-        Return all possible moves that can be applied to this state.
+        Return all possible moves that can be applied to this state: the
+        numbers of the unclaimed cells (see stonehenge_geometry).
+
+        >>> state = StonehengeState(True, 1, new_cells(1), [['@'] * 2] * 3)
+        >>> state.get_possible_moves(), state.make_move(1).get_possible_moves()
+        ([0, 1, 2], [])
         """
-        count1, count2 = 0, 0
-        for group in self.ley_line_markers:
-            for marker in group:
-                if marker == '1':
-                    count1 += 1
-                elif marker == '2':
-                    count2 += 1
-        if (count1 >= len(self.ley_line_markers[0] * 3) / 2 or
-                count2 >= len(self.ley_line_markers[0] * 3) / 2):
+        if self.lines_decided():
             return []
         result = []
-        for line in self.cells:
-            for cell in line:
+        for line, numbers in zip(self.cells, cell_numbers(self.size)):
+            for cell, number in zip(line, numbers):
                 if cell != '1' and cell != '2':
-                    result.append(cell)
+                    result.append(number)
         return result
 
-    def markers_after_claimed(self, markers: List[List[str]],
-                              cells: List[List[str]],
-                              indexl: int, indexm: int) -> List[List[str]]:
-        """
-        Return markers after claiming by the player of the current turn.
-        The player can claim a marker iff they had newly captured at least
-        half of the cells in a ley-line.
-        """
-        indexm_inverse = indexm - len(cells[indexl])
-        # horizontal:
-        group1 = markers[0][:]
-        if group1[indexl] == '@':
-            self.claim_marker(cells[indexl], group1, indexl)
-
-        # diagonal-right:
-        group2 = markers[1][:]
-        if indexl + 1 != len(cells):
-            if group2[indexm_inverse] == '@':
-                ley_line = self.dr_leyline_v1(cells, indexm, indexm_inverse)
-                self.claim_marker(ley_line, group2, indexm_inverse)
-        else:
-            if group2[indexm_inverse - 1] == '@':
-                ley_line = self.dr_leyline_v2(cells, indexm_inverse)
-                self.claim_marker(ley_line, group2, indexm_inverse - 1)
-
-        # diagonal-left:
-        group3 = markers[2][:]
-        if indexl + 1 != len(cells):
-            if group3[indexm] == '@':
-                ley_line = self.dl_leyline_v1(cells, indexm)
-                self.claim_marker(ley_line, group3, indexm)
-        else:
-            if group3[indexm + 1] == '@':
-                ley_line = self.dl_leyline_v2(cells, indexm)
-                self.claim_marker(ley_line, group3, indexm + 1)
-
-        return [group1, group2, group3]
+    def lines_decided(self) -> bool:
+        """
+        Return whether a player has claimed at least half of the ley-lines.
+        """
+        return 2 * max(self.lines_claimed) >= 3 * (self.size + 1)
 
-    def dr_leyline_v1(self, cells: List[List[str]], indexm: int,
-                      indexm_inverse: int) -> List[str]:
+    def is_over(self) -> bool:
         """
-        Return a diagonal-right ley-line in the condition that move made
-        is NOT in the last line of cells.
+        Return whether or not the StonehengeGame is over at this state, i.e.
+        whether a player has claimed at least half of the ley-lines or no
+        cell is left, without building the list of possible moves.
+
+        >>> state = StonehengeState(True, 1, new_cells(1), [['@'] * 2] * 3)
+        >>> state.is_over(), state.make_move('A').is_over()
+        (False, True)
         """
-        ley_line = []
-        for layer in cells[:-1]:
-            if -1 * indexm_inverse <= len(layer):
-                ley_line.append(layer[indexm_inverse])
-        if indexm <= len(cells[-1]) - 2:
-            ley_line.append(cells[-1][indexm_inverse + 1])
-        return ley_line
+        return self.free_cells == 0 or self.lines_decided()
 
-    def dr_leyline_v2(self, cells: List[List[str]],
-                      indexm_inverse: int) -> List[str]:
+    def terminal_score(self) -> Optional[int]:
         """
-        Return a diagonal-right ley-line in the condition that move made
-        is in the last line of cells.
+        Return LOSE if the game is over at this state, since the other
+        player made the move that ended it, otherwise None.
         """
-        ley_line = []
-        for layer in cells[:-1]:
-            if -1 * (indexm_inverse - 1) <= len(layer):
-                ley_line.append(layer[indexm_inverse - 1])
-        ley_line.append(cells[-1][indexm_inverse])
-        return ley_line
+        return self.LOSE if self.is_over() else None
 
-    def dl_leyline_v1(self, cells: List[List[str]], indexm: int) -> List[str]:
+    def is_valid_move(self, move: Any) -> bool:
         """
-        Return a diagonal-left ley-line in the condition that move made
-        is NOT in the last line of cells.
+        Return whether move is a valid move for this state, without building
+        the list of possible moves.
+
+        >>> state = StonehengeState(True, 1, new_cells(1), [['@'] * 2] * 3)
+        >>> state.is_valid_move('A'), state.is_valid_move('D')
+        (True, False)
+        >>> state.make_move('B').is_valid_move('B')
+        False
+        >>> state.is_valid_move(2), state.make_move(2).is_valid_move('C')
+        (True, False)
         """
-        ley_line = []
-        for layer in cells[:-1]:
-            if indexm <= len(layer) - 1:
-                ley_line.append(layer[indexm])
-        if 0 <= indexm - 1 <= len(cells[-1]):
-            ley_line.append(cells[-1][indexm - 1])
-        return ley_line
+        position = locate(self.size, move)
+        if position is None:
+            return False
+        line, index, _ = position
+        # A claimed cell shows its player instead of its label.
+        return (self.cells[line][index] not in ('1', '2')
+                and not self.lines_decided())
 
-    def dl_leyline_v2(self, cells: List[List[str]], indexm: int) -> List[str]:
+    def is_winner(self, player: str) -> bool:
         """
-        Return a diagonal-left ley-line in the condition that move made
-        is in the last line of cells.
+        Return whether player has won the StonehengeGame at this state, i.e.
+        whether player made the move that ended the game.
+
+        Precondition: player is 'p1' or 'p2'.
         """
-        ley_line = []
-        for layer in cells[:-1]:
-            if indexm + 1 <= len(layer) - 1:
-                ley_line.append(layer[indexm + 1])
-        ley_line.append(cells[-1][indexm])
-        return ley_line
+        return self.get_current_player_name() != player and self.is_over()
 
-    def make_move(self, move: str) -> 'StonehengeState':
+    def make_move(self, move: Union[str, int]) -> 'StonehengeState':
         """
-        Return the StonehengeState that results from applying move to this
-        StonehengeState.
+        Return the StonehengeState that results from applying move, the
+        label or the number of a cell, to this StonehengeState.
         """
         if not self.is_valid_move(move):
             return self
-        cells = deepcopy(self.cells)
-        markers = deepcopy(self.ley_line_markers)
-        index_move = [(i, el.index(move)) for i, el
-                      in enumerate(cells) if move in el]
-        indexl = index_move[0][0]
-        indexm = index_move[0][1]
-        cells[indexl][indexm] = self.display_player()
-        new_markers = self.markers_after_claimed(markers, cells, indexl,
-                                                 indexm)
         return StonehengeState(self.take_turn(), self.size,
-                               cells, new_markers)
+                               *self._after_move(move))
 
-    def claim_marker(self, ley_line: List[str], marker_list: List[str],
-                     index: int) -> None:
+    def apply_move(self, move: Union[str, int]) -> tuple:
         """
-        Let the current player claim the marker in marker_list at index
-        iff the player newly captured at least half of the cells in ley_line.
+        Apply the valid move to this StonehengeState in place, and return
+        the cells, markers, hashes and counts it replaced and the moves this
+        state kept.
+
+        >>> state = StonehengeState(True, 1, new_cells(1),
+        ...                         [['@', '@'], ['@', '@'], ['@', '@']])
+        >>> key = state.state_key()
+        >>> undo = state.apply_move('A')
+        >>> state.cells, state.state_key() == key
+        ((('1', 'B'), ('C',)), False)
+        >>> state.undo_move(undo)
+        >>> state.cells, state.state_key() == key
+        ((('A', 'B'), ('C',)), True)
+        """
+        undo = (self.cells, self.ley_line_markers, self.zobrist,
+                self.line_counts, self.lines_claimed, self.threats,
+                self.free_cells, self.forget_moves())
+        (self.cells, self.ley_line_markers, self.zobrist, self.line_counts,
+         self.lines_claimed, self.threats,
+         self.free_cells) = self._after_move(move)
+        self.p1_turn = not self.p1_turn
+        return undo
+
+    def undo_move(self, undo: tuple) -> None:
+        """
+        Put back the cells, markers, hashes, counts and kept moves in undo,
+        as returned by apply_move, and give the turn back.
+        """
+        (self.cells, self.ley_line_markers, self.zobrist, self.line_counts,
+         self.lines_claimed, self.threats, self.free_cells, kept) = undo
+        self.p1_turn = not self.p1_turn
+        self.restore_moves(kept)
+
+    def _after_move(self, move: Union[str, int]) -> tuple:
+        """
+        Return the cells, ley-line markers, Zobrist hashes, ley-line counts,
+        numbers of claimed ley-lines, threats and number of free cells after
+        the valid move is applied to this StonehengeState.
         """
         player = self.display_player()
-        count = ley_line.count(player)
-        if count >= len(ley_line) / 2:
-            marker_list[index] = player
+        indexl, indexm, cell = locate(self.size, move)
+        row = self.cells[indexl]
+        cells = (self.cells[:indexl]
+                 + (row[:indexm] + (player,) + row[indexm + 1:],)
+                 + self.cells[indexl + 1:])
+        # Only the counts of the three ley-lines through cell change, and
+        # only those ley-lines can be claimed.
+        mine = 0 if self.p1_turn else 1
+        counts = list(self.line_counts[mine])
+        lines_claimed = list(self.lines_claimed)
+        markers = list(self.ley_line_markers)
+        threats = list(self.threats)
+        # The claimed cell and markers, numbered as in stonehenge_geometry.
+        claimed = [cell]
+        for line in cell_lines(self.size)[cell]:
+            counts[line] += 1
+            group, index = divmod(line, self.size + 1)
+            if markers[group][index] != '@':
+                continue
+            if 2 * counts[line] >= line_lengths(self.size)[line]:
+                markers[group] = (markers[group][:index] + (player,)
+                                  + markers[group][index + 1:])
+                lines_claimed[mine] += 1
+                claimed.append(len(cell_positions(self.size)) + line)
+                threats = [threat & ~(1 << line) for threat in threats]
+            elif 2 * (counts[line] + 1) >= line_lengths(self.size)[line]:
+                threats[mine] |= 1 << line
+        if mine == 0:
+            line_counts = (tuple(counts), self.line_counts[1])
+        else:
+            line_counts = (self.line_counts[0], tuple(counts))
+        return (cells, tuple(markers),
+                update_hashes(self.zobrist, self.size, player, claimed),
+                line_counts, tuple(lines_claimed), tuple(threats),
+                self.free_cells - 1)
+
+    def immediate_gain(self, move: Union[str, int]) -> int:
+        """
+        Return the number of ley-lines the current player would claim by
+        applying move, or 0 if move is not valid.
+        """
+        if not self.is_valid_move(move):
+            return 0
+        counts = self.line_counts[0 if self.p1_turn else 1]
+        gain = 0
+        for line in cell_lines(self.size)[locate(self.size, move)[2]]:
+            group, index = divmod(line, self.size + 1)
+            if (self.ley_line_markers[group][index] == '@'
+                    and 2 * (counts[line] + 1)
+                    >= line_lengths(self.size)[line]):
+                gain += 1
+        return gain
 
     def display_player(self) -> str:
         """
@@ -362,34 +676,135 @@ class StonehengeState(GameState):
         return r.format(self.p1_turn, self.size, self.cells,
                         self.ley_line_markers)
 
+    def state_key(self) -> int:
+        """
+        Return the Zobrist hash of this state. Two different states only
+        share it in the very unlikely case of a 64-bit hash collision.
+
+        >>> state = StonehengeState(True, 2, new_cells(2), [['@'] * 3] * 3)
+        >>> state.make_move('A').make_move('B').state_key() == \\
+        ...     state.make_move('B').make_move('A').state_key()
+        False
+        >>> state.make_move('A').make_move('B').state_key() == \\
+        ...     state.make_move('A').make_move('B').state_key()
+        True
+        """
+        return self.zobrist[0]
+
+    def pack(self) -> int:
+        """
+        Return this state packed into a single int. From the lowest bits up,
+        it holds the size (8 bits), whether it is p1's turn (1 bit), then
+        2 bits per cell and 2 bits per ley-line marker: 0 if unclaimed,
+        otherwise the number of the player who claimed it.
+        """
+        return self.pack_symmetric(0)
+
+    def pack_symmetric(self, symmetry: int) -> int:
+        """
+        Return the state that the numbered symmetry of the board (see
+        stonehenge_geometry.symmetries) moves this state to, packed as in
+        pack().
+        """
+        symbols = self.symbols()
+        packed = 0
+        for position in reversed(symmetries(self.size)[symmetry]):
+            packed = packed << 2 | PACK_CODES.get(symbols[position], 0)
+        return (packed << 1 | int(self.p1_turn)) << 8 | self.size
+
+    def canonical_form(self) -> Tuple[int, int]:
+        """
+        Return the smallest of the packed states that the symmetries of the
+        board move this state to, and the number of a symmetry that gives
+        it. Use symmetric_move to turn moves from this state into moves from
+        the state in that packed form.
+
+        >>> state = StonehengeState(True, 2, new_cells(2), [['@'] * 3] * 3)
+        >>> state.make_move('A').canonical_form()[0] == \\
+        ...     state.make_move('B').canonical_form()[0]
+        True
+        """
+        return min((self.pack_symmetric(symmetry), symmetry)
+                   for symmetry in range(len(symmetries(self.size))))
+
+    def canonical_key(self) -> int:
+        """
+        Return a key that is equal for two states iff a symmetry of the
+        board moves one to the other: the smallest of the Zobrist hashes of
+        this state, barring 64-bit hash collisions. Use canonical_form for an
+        exact key.
+
+        >>> state = StonehengeState(True, 2, new_cells(2), [['@'] * 3] * 3)
+        >>> state.make_move('A').canonical_key() == \\
+        ...     state.make_move('G').canonical_key()
+        True
+        >>> state.make_move('A').canonical_key() == \\
+        ...     state.make_move('D').canonical_key()
+        False
+        """
+        return min(self.zobrist)
+
+    def symmetric_move(self, move: int, symmetry: int) -> int:
+        """
+        Return the move that the numbered symmetry of the board turns move
+        into.
+
+        >>> state = StonehengeState(True, 2, new_cells(2), [['@'] * 3] * 3)
+        >>> [state.symmetric_move(move, 1) for move in range(7)]
+        [2, 5, 0, 3, 6, 1, 4]
+        """
+        return map_cell(self.size, move, symmetry)
+
+    @classmethod
+    def unpack(cls, packed: int) -> 'StonehengeState':
+        """
+        Return the StonehengeState that was packed into packed.
+        """
+        size = packed & 0xff
+        p1_turn = bool(packed >> 8 & 1)
+        packed >>= 9
+        cells = new_cells(size)
+        for line in cells:
+            for i in range(len(line)):
+                line[i] = PACK_SYMBOLS.get(packed & 3, line[i])
+                packed >>= 2
+        markers = []
+        for _ in range(3):
+            group = []
+            for _ in range(size + 1):
+                group.append(PACK_SYMBOLS.get(packed & 3, '@'))
+                packed >>= 2
+            markers.append(group)
+        return cls(p1_turn, size, cells, markers)
+
+    def is_free_cell(self, cell: int) -> bool:
+        """
+        Return whether the cell numbered cell (see stonehenge_geometry) is
+        not claimed yet.
+        """
+        row, column = cell_positions(self.size)[cell]
+        return self.cells[row][column] not in ('1', '2')
+
     def max_after_claim(self) -> int:
         """
         Return the most number of ley-lines already claimed by the current
         player after one of the possible moves is applied.
         """
-        result = []
-        for move in self.get_possible_moves():
-            sum_ley_line = sum(self.make_move(move).ley_line_markers, [])
-            number_claimed = sum([1 if marker == self.display_player() else 0
-                                  for marker in sum_ley_line])
-            result.append(number_claimed)
-        return max(result)
+        mine = 0 if self.p1_turn else 1
+        return self.lines_claimed[mine] + best_gain(
+            self.size, self.threats[mine], self.is_free_cell)
 
     def rough_outcome(self) -> float:
         """
         Return an estimate in interval [LOSE, WIN] of best outcome the current
         player can guarantee in at most two states ahead.
         """
-        if self.get_possible_moves() == []:
+        if self.is_over():
             return self.LOSE
-        else:
-            number_ley_line = len(self.ley_line_markers[0]) * 3
-            if self.max_after_claim() >= number_ley_line / 2:
-                return self.WIN
-            elif all([self.make_move(move).max_after_claim() >= number_ley_line
-                      / 2 for move in self.get_possible_moves()]):
-                return self.LOSE
-            return self.DRAW
+        mine = 0 if self.p1_turn else 1
+        return threat_outcome(
+            self.size, (self.lines_claimed[mine], self.lines_claimed[1 - mine]),
+            (self.threats[mine], self.threats[1 - mine]), self.is_free_cell)
 
 
 def add_between(list_to_add: list, const: Union[list, str]) -> list:
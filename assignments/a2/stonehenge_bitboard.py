@@ -0,0 +1,355 @@
+"""
+A Stonehenge state stored as bitmasks.
+
+BitboardStonehengeState plays the same game as StonehengeState, but keeps
+the cells each player has claimed in one int per player (cell i, numbered as
+in stonehenge_geometry, is bit i), and likewise for the ley-lines. A move
+sets one bit, and a ley-line is captured by counting the bits its mask
+shares with the player's cells, so no lists are copied or scanned.
+"""
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Union
+from game_state import GameState
+from stonehenge import StonehengeGame, StonehengeState, new_cells, \
+    locate, best_gain, threat_outcome
+from stonehenge_geometry import line_masks, cell_lines, symmetries, \
+    popcount
+
+
+class BitboardStonehengeState(GameState):
+    """
+    The state of a Stonehenge game, stored as bitmasks.
+
+    size - the side length of the board
+    cells - the cells claimed by player 1 and by player 2, as bitmasks
+    lines - the ley-lines claimed by player 1 and by player 2, as bitmasks
+    labels - the label of each cell
+    """
+    size: int
+    cells: Tuple[int, int]
+    lines: Tuple[int, int]
+    labels: Tuple[str, ...]
+
+    def __init__(self, is_p1_turn: bool, size: int,
+                 cells: Tuple[int, int] = (0, 0),
+                 lines: Tuple[int, int] = (0, 0)) -> None:
+        """
+        Initialize this BitboardStonehengeState with the claimed cells and
+        ley-lines of each player, and set the current player based on
+        is_p1_turn.
+        Extends GameState.__init__
+
+        >>> state = BitboardStonehengeState(True, 2)
+        >>> state.get_possible_moves()
+        [0, 1, 2, 3, 4, 5, 6]
+        """
+        GameState.__init__(self, is_p1_turn)
+        self.size = size
+        self.cells = cells
+        self.lines = lines
+        self.labels = _labels(size)
+
+    @classmethod
+    def from_state(cls, state: StonehengeState) -> 'BitboardStonehengeState':
+        """
+        Return the BitboardStonehengeState equal to state.
+
+        >>> state = StonehengeState(True, 1, [['1', 'B'], ['C']],
+        ...                         [['1', '@'], ['@', '1'], ['@', '@']])
+        >>> bitboard = BitboardStonehengeState.from_state(state)
+        >>> bitboard.cells, bitboard.lines
+        ((1, 0), (9, 0))
+        """
+        return cls.unpack(state.pack())
+
+    def to_state(self) -> StonehengeState:
+        """
+        Return the StonehengeState equal to this state.
+        """
+        return StonehengeState.unpack(self.pack())
+
+    def __str__(self) -> str:
+        """
+        Return the board of this state, drawn as StonehengeState draws it.
+
+        >>> print(BitboardStonehengeState(True, 1).make_move('A'))
+              1   @
+             /   /
+        1 - 1 - B
+             \\ / \\
+          @ - C   @
+               \\
+                1
+        """
+        return str(self.to_state())
+
+    def __repr__(self) -> str:
+        """
+        Return a representation of this state (which can be used for
+        equality testing).
+        """
+        r = "P1's turn: {} - Board size: {} - Cells: {} - Ley-lines: {}"
+        return r.format(self.p1_turn, self.size, self.cells, self.lines)
+
+    def get_possible_moves(self) -> List[int]:
+        """
+        Return all possible moves that can be applied to this state: the
+        numbers of the unclaimed cells.
+        """
+        if self.is_over():
+            return []
+        claimed = self.cells[0] | self.cells[1]
+        return [cell for cell in range(len(self.labels))
+                if not claimed >> cell & 1]
+
+    def is_valid_move(self, move: Any) -> bool:
+        """
+        Return whether move is a valid move for this state.
+        """
+        position = locate(self.size, move)
+        return (position is not None and not self.is_over()
+                and not (self.cells[0] | self.cells[1]) >> position[2] & 1)
+
+    def is_over(self) -> bool:
+        """
+        Return whether or not the game is over at this state, i.e. whether a
+        player has claimed at least half of the ley-lines.
+        """
+        total = len(line_masks(self.size))
+        return (2 * popcount(self.lines[0]) >= total
+                or 2 * popcount(self.lines[1]) >= total)
+
+    def is_winner(self, player: str) -> bool:
+        """
+        Return whether player has won the game at this state, i.e. whether
+        player made the move that ended the game.
+
+        Precondition: player is 'p1' or 'p2'.
+        """
+        return self.get_current_player_name() != player and self.is_over()
+
+    def terminal_score(self) -> Optional[int]:
+        """
+        Return LOSE if the game is over at this state, since the other
+        player made the move that ended it, otherwise None.
+        """
+        return self.LOSE if self.is_over() else None
+
+    def captured_lines(self, cell: int) -> int:
+        """
+        Return the bitmask of the unclaimed ley-lines through cell that the
+        current player would capture by claiming cell.
+        """
+        player = 0 if self.p1_turn else 1
+        cells = self.cells[player] | 1 << cell
+        free = ~(self.lines[0] | self.lines[1])
+        masks = line_masks(self.size)
+        captured = 0
+        for line in cell_lines(self.size)[cell]:
+            if (free >> line & 1
+                    and 2 * popcount(cells & masks[line])
+                    >= popcount(masks[line])):
+                captured |= 1 << line
+        return captured
+
+    def make_move(self, move: Union[str, int]) -> 'BitboardStonehengeState':
+        """
+        Return the BitboardStonehengeState that results from applying move,
+        the label or the number of a cell, to this state, or this state if
+        move is not valid.
+
+        >>> state = BitboardStonehengeState(True, 1).make_move('C')
+        >>> state.cells, state.lines
+        ((4, 0), (38, 0))
+        """
+        if not self.is_valid_move(move):
+            return self
+        return BitboardStonehengeState(not self.p1_turn, self.size,
+                                       *self._after_move(move))
+
+    def apply_move(self, move: Union[str, int]) -> tuple:
+        """
+        Apply the valid move to this state in place, and return the cells
+        and ley-lines it replaced and the moves this state kept.
+
+        >>> state = BitboardStonehengeState(True, 1)
+        >>> undo = state.apply_move('C')
+        >>> state.cells, state.lines, state.p1_turn
+        ((4, 0), (38, 0), False)
+        >>> state.undo_move(undo)
+        >>> state.cells, state.lines, state.p1_turn
+        ((0, 0), (0, 0), True)
+        """
+        undo = self.cells, self.lines, self.forget_moves()
+        self.cells, self.lines = self._after_move(move)
+        self.p1_turn = not self.p1_turn
+        return undo
+
+    def undo_move(self, undo: tuple) -> None:
+        """
+        Put back the cells, ley-lines and kept moves in undo, as returned by
+        apply_move, and give the turn back.
+        """
+        self.cells, self.lines, kept = undo
+        self.p1_turn = not self.p1_turn
+        self.restore_moves(kept)
+
+    def _after_move(self, move: Union[str, int]) \
+            -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        Return the cells and ley-lines of each player after the valid move
+        is applied to this state.
+        """
+        cell = locate(self.size, move)[2]
+        captured = self.captured_lines(cell)
+        if self.p1_turn:
+            cells = (self.cells[0] | 1 << cell, self.cells[1])
+            lines = (self.lines[0] | captured, self.lines[1])
+        else:
+            cells = (self.cells[0], self.cells[1] | 1 << cell)
+            lines = (self.lines[0], self.lines[1] | captured)
+        return cells, lines
+
+    def immediate_gain(self, move: Union[str, int]) -> int:
+        """
+        Return the number of ley-lines the current player would claim by
+        applying move, or 0 if move is not valid.
+        """
+        if not self.is_valid_move(move):
+            return 0
+        return popcount(self.captured_lines(locate(self.size, move)[2]))
+
+    def state_key(self) -> tuple:
+        """
+        Return a hashable key that is equal for two states iff they have the
+        same cells, the same ley-line markers and the same current player.
+        """
+        return self.p1_turn, self.size, self.cells, self.lines
+
+    def pack_symmetric(self, symmetry: int) -> int:
+        """
+        Return the state that the numbered symmetry of the board moves this
+        state to, packed as in StonehengeState.pack_symmetric.
+        """
+        # The cells and then the ley-lines each player owns, numbered as in
+        # the symmetry tuples.
+        p1_owned = self.cells[0] | self.lines[0] << len(self.labels)
+        p2_owned = self.cells[1] | self.lines[1] << len(self.labels)
+        packed = 0
+        for position in reversed(symmetries(self.size)[symmetry]):
+            packed = (packed << 2 | (p1_owned >> position & 1)
+                      | (p2_owned >> position & 1) << 1)
+        return (packed << 1 | int(self.p1_turn)) << 8 | self.size
+
+    def pack(self) -> int:
+        """
+        Return this state packed into a single int, in the same format as
+        StonehengeState.pack.
+        """
+        return self.pack_symmetric(0)
+
+    @classmethod
+    def unpack(cls, packed: int) -> 'BitboardStonehengeState':
+        """
+        Return the BitboardStonehengeState that was packed into packed.
+        """
+        size = packed & 0xff
+        p1_turn = bool(packed >> 8 & 1)
+        packed >>= 9
+        masks = [0, 0]
+        for position in range(len(symmetries(size)[0])):
+            if packed & 3:
+                masks[(packed & 3) - 1] |= 1 << position
+            packed >>= 2
+        cells = len(_labels(size))
+        all_cells = (1 << cells) - 1
+        return cls(p1_turn, size,
+                   (masks[0] & all_cells, masks[1] & all_cells),
+                   (masks[0] >> cells, masks[1] >> cells))
+
+    def canonical_form(self) -> Tuple[int, int]:
+        """
+        Return the smallest of the packed states that the symmetries of the
+        board move this state to, and the number of a symmetry that gives
+        it.
+        """
+        return min((self.pack_symmetric(symmetry), symmetry)
+                   for symmetry in range(len(symmetries(self.size))))
+
+    def canonical_key(self) -> int:
+        """
+        Return a key that is equal for two states iff a symmetry of the
+        board moves one to the other.
+        """
+        return self.canonical_form()[0]
+
+    def is_free_cell(self, cell: int) -> bool:
+        """
+        Return whether cell is not claimed yet.
+        """
+        return not (self.cells[0] | self.cells[1]) >> cell & 1
+
+    def threats(self) -> Tuple[int, int]:
+        """
+        Return bitmasks of the unclaimed ley-lines that player 1, and player
+        2, would capture by claiming one more of their cells.
+        """
+        claimed = self.lines[0] | self.lines[1]
+        masks = line_masks(self.size)
+        return tuple(sum(1 << line for line in range(len(masks))
+                         if not claimed >> line & 1
+                         and 2 * (popcount(cells & masks[line]) + 1)
+                         >= popcount(masks[line]))
+                     for cells in self.cells)
+
+    def max_after_claim(self) -> int:
+        """
+        Return the most ley-lines the current player has claimed after one
+        of the possible moves is applied.
+        """
+        mine = 0 if self.p1_turn else 1
+        return popcount(self.lines[mine]) + best_gain(
+            self.size, self.threats()[mine], self.is_free_cell)
+
+    def rough_outcome(self) -> float:
+        """
+        Return an estimate in interval [LOSE, WIN] of best outcome the current
+        player can guarantee in at most two states ahead.
+        """
+        if self.is_over():
+            return self.LOSE
+        mine = 0 if self.p1_turn else 1
+        threats = self.threats()
+        return threat_outcome(
+            self.size, (popcount(self.lines[mine]),
+                        popcount(self.lines[1 - mine])),
+            (threats[mine], threats[1 - mine]), self.is_free_cell)
+
+
+@lru_cache(maxsize=None)
+def _labels(size: int) -> Tuple[str, ...]:
+    """
+    Return the label of each cell of a board with side length size.
+    """
+    return tuple(sum(new_cells(size), []))
+
+
+class BitboardStonehengeGame(StonehengeGame):
+    """
+    A StonehengeGame whose states are BitboardStonehengeStates.
+    """
+
+    def __init__(self, p1_starts: bool) -> None:
+        """
+        Initialize this BitboardStonehengeGame, using p1_starts to find who
+        the first player is.
+        Extends StonehengeGame.__init__
+        """
+        StonehengeGame.__init__(self, p1_starts)
+        self.current_state = BitboardStonehengeState.from_state(
+            self.current_state)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
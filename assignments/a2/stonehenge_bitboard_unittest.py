@@ -0,0 +1,149 @@
+"""
+Unittests for the bitboard Stonehenge state in stonehenge_bitboard.py.
+
+The basic Stonehenge unittests are run again on BitboardStonehengeGame, and
+the bitboard state must follow the same games as StonehengeState.
+"""
+import random
+import unittest
+from unittest.mock import patch
+
+import stonehenge_unittest_basic
+from stonehenge import StonehengeState, new_cells
+from stonehenge_bitboard import BitboardStonehengeGame, \
+    BitboardStonehengeState
+
+
+class BitboardStonehengeUnitTests(
+        stonehenge_unittest_basic.StonehengeUnitTests):
+    """
+    The basic Stonehenge unittests, played with BitboardStonehengeGame.
+    """
+    def setUp(self):
+        """
+        Make the basic unittests use BitboardStonehengeGame.
+        """
+        patcher = patch.object(stonehenge_unittest_basic, 'StonehengeGame',
+                               BitboardStonehengeGame)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestSameGames(unittest.TestCase):
+    """
+    Compare BitboardStonehengeState with StonehengeState along random games.
+    """
+    def test_random_games(self):
+        """
+        Test that both states have the same moves, gains, boards, packed
+        forms and outcomes after every move of random games.
+        """
+        random.seed(148)
+        for size in range(1, 6):
+            for p1_turn in (True, False):
+                state = StonehengeState(
+                    p1_turn, size, new_cells(size),
+                    [['@'] * (size + 1) for _ in range(3)])
+                bitboard = BitboardStonehengeState(p1_turn, size)
+                while True:
+                    moves = state.get_possible_moves()
+                    self.assertEqual(bitboard.get_possible_moves(), moves)
+                    self.assertEqual(str(bitboard), str(state))
+                    self.assertEqual(bitboard.pack(), state.pack())
+                    self.assertEqual(bitboard.canonical_form(),
+                                     state.canonical_form())
+                    self.assertEqual(bitboard.rough_outcome(),
+                                     state.rough_outcome())
+                    for player in ('p1', 'p2'):
+                        self.assertEqual(bitboard.is_winner(player),
+                                         state.is_winner(player))
+                    if moves == []:
+                        break
+                    self.assertEqual([bitboard.immediate_gain(move)
+                                      for move in moves],
+                                     [state.immediate_gain(move)
+                                      for move in moves])
+                    move = random.choice(moves)
+                    state = state.make_move(move)
+                    bitboard = bitboard.make_move(move)
+
+    def test_large_boards(self):
+        """
+        Test that both states have the same moves, gains, boards and packed
+        forms along random games on boards with more than 26 cells.
+        """
+        random.seed(148)
+        for size in range(6, 11):
+            state = StonehengeState(True, size, new_cells(size),
+                                    [['@'] * (size + 1) for _ in range(3)])
+            bitboard = BitboardStonehengeState(True, size)
+            while not state.is_over():
+                moves = state.get_possible_moves()
+                self.assertEqual(bitboard.get_possible_moves(), moves)
+                self.assertEqual(bitboard.pack(), state.pack())
+                self.assertEqual([bitboard.immediate_gain(move)
+                                  for move in moves],
+                                 [state.immediate_gain(move)
+                                  for move in moves])
+                move = random.choice(moves)
+                state = state.make_move(move)
+                bitboard = bitboard.make_move(move)
+            self.assertTrue(bitboard.is_over())
+            self.assertEqual(str(bitboard), str(state))
+
+    def test_labels(self):
+        """
+        Test that the moves are the numbers of the unclaimed cells, and that
+        playing the labels of the cells instead gives the same states, for
+        both kinds of state.
+        """
+        random.seed(148)
+        for size in range(1, 5):
+            labels = sum(new_cells(size), [])
+            for state in (StonehengeState(True, size, new_cells(size),
+                                          [['@'] * (size + 1)] * 3),
+                          BitboardStonehengeState(True, size)):
+                by_label = state
+                while not state.is_over():
+                    moves = state.get_possible_moves()
+                    self.assertEqual([number for number in range(-1, 100)
+                                      if state.is_valid_move(number)], moves)
+                    self.assertEqual([label for label in labels
+                                      if by_label.is_valid_move(label)],
+                                     [labels[move] for move in moves])
+                    move = random.choice(moves)
+                    self.assertEqual(
+                        by_label.immediate_gain(labels[move]),
+                        state.immediate_gain(move))
+                    state = state.make_move(move)
+                    by_label = by_label.make_move(labels[move])
+                    self.assertEqual(by_label.pack(), state.pack())
+                self.assertIs(by_label.make_move('A'), by_label)
+
+    def test_invalid_move(self):
+        """
+        Test that an invalid move leaves the state as it is.
+        """
+        bitboard = BitboardStonehengeState(True, 2).make_move('A')
+        self.assertIs(bitboard.make_move('A'), bitboard)
+        self.assertIs(bitboard.make_move('-1'), bitboard)
+
+    def test_str_to_move(self):
+        """
+        Test that str_to_move turns the label of an unclaimed cell into its
+        number and move_to_str turns it back, for both kinds of game.
+        """
+        for game_class in (stonehenge_unittest_basic.StonehengeGame,
+                           BitboardStonehengeGame):
+            with patch('builtins.input', return_value='6'):
+                game = game_class(True)
+            self.assertEqual([game.str_to_move(label)
+                              for label in ('A', 'D', 'AA', 'AG', 'AH')],
+                             [0, 3, 26, 32, -1])
+            self.assertEqual(game.move_to_str(26), 'AA')
+            game.current_state = game.current_state.make_move(3)
+            self.assertEqual(game.str_to_move('D'), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
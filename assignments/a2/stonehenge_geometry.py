@@ -0,0 +1,199 @@
+"""
+The geometry of a Stonehenge board: where its cells are, which cells make
+up each ley-line and how the symmetries of the board move them.
+
+Cells are numbered 0, 1, 2, ... in the order of StonehengeState.cells read
+line by line, and ley-lines are numbered in the order of
+StonehengeState.ley_line_markers read group by group. Everything here only
+depends on the side length, so it is computed once per side length.
+
+A board with side length n is a triangle with side length n + 2 whose three
+corners are missing. Each cell of the triangle has three coordinates
+(a, b, c) with a + b + c == n + 1: a is the index of the cell in its line of
+the full triangle, b is its distance from the other end of that line and c
+is the number of lines below it. Each kind of ley-line keeps one coordinate
+fixed, and permuting the coordinates gives the 6 rotations and reflections
+of the board.
+"""
+from functools import lru_cache
+from itertools import permutations
+from typing import Tuple
+
+# For each group of ley-line markers, the coordinate its ley-lines keep
+# fixed.
+GROUP_AXES = (2, 1, 0)
+
+
+@lru_cache(maxsize=None)
+def cell_coordinates(size: int) -> Tuple[Tuple[int, int, int], ...]:
+    """
+    Return the coordinates (a, b, c) of each cell of a board with side
+    length size.
+
+    >>> cell_coordinates(1)
+    ((0, 1, 1), (1, 0, 1), (1, 1, 0))
+    """
+    coordinates = []
+    for row in range(size + 1):
+        # The last line of cells is missing both corners of the triangle.
+        line = size + 1 if row == size else row + 1
+        for index in range(1 if row == size else 0, line + 1):
+            if row == size and index == line:
+                break
+            coordinates.append((index, line - index, size + 1 - line))
+    return tuple(coordinates)
+
+
+@lru_cache(maxsize=None)
+def cell_positions(size: int) -> Tuple[Tuple[int, int], ...]:
+    """
+    Return the index of the line of cells holding each cell of a board with
+    side length size, and the index of the cell in that line.
+
+    >>> cell_positions(1)
+    ((0, 0), (0, 1), (1, 0))
+    """
+    positions = []
+    for row in range(size + 1):
+        positions.extend((row, column)
+                         for column in range(size if row == size else row + 2))
+    return tuple(positions)
+
+
+@lru_cache(maxsize=None)
+def cell_numbers(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return the number of each cell of a board with side length size, one
+    tuple per line of cells.
+
+    >>> cell_numbers(2)
+    ((0, 1), (2, 3, 4), (5, 6))
+    """
+    rows = [[] for _ in range(size + 1)]
+    for cell, (row, _) in enumerate(cell_positions(size)):
+        rows[row].append(cell)
+    return tuple(tuple(row) for row in rows)
+
+
+@lru_cache(maxsize=None)
+def ley_lines(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return the cells of each ley-line of a board with side length size.
+
+    >>> ley_lines(1)
+    ((0, 1), (2,), (0, 2), (1,), (0,), (1, 2))
+    """
+    coordinates = cell_coordinates(size)
+    lines = []
+    for axis in GROUP_AXES:
+        for index in range(size + 1):
+            # Diagonal-left ley-lines are numbered from the left, the others
+            # from the top.
+            value = index if axis == 0 else size - index
+            lines.append(tuple(cell for cell, coordinate
+                               in enumerate(coordinates)
+                               if coordinate[axis] == value))
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def line_lengths(size: int) -> Tuple[int, ...]:
+    """
+    Return the number of cells in each ley-line of a board with side length
+    size.
+
+    >>> line_lengths(2)
+    (2, 3, 2, 2, 3, 2, 2, 3, 2)
+    """
+    return tuple(len(line) for line in ley_lines(size))
+
+
+@lru_cache(maxsize=None)
+def line_masks(size: int) -> Tuple[int, ...]:
+    """
+    Return a bitmask of the cells of each ley-line of a board with side
+    length size, where cell i is bit i.
+
+    >>> line_masks(1)
+    (3, 4, 5, 2, 1, 6)
+    """
+    return tuple(sum(1 << cell for cell in line) for line in ley_lines(size))
+
+
+@lru_cache(maxsize=None)
+def cell_lines(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return the ley-lines through each cell of a board with side length size.
+
+    >>> cell_lines(1)
+    ((0, 2, 4), (0, 3, 5), (1, 2, 5))
+    """
+    lines = ley_lines(size)
+    return tuple(tuple(line for line in range(len(lines))
+                       if cell in lines[line])
+                 for cell in range(len(cell_coordinates(size))))
+
+
+@lru_cache(maxsize=None)
+def cell_line_masks(size: int) -> Tuple[int, ...]:
+    """
+    Return a bitmask of the ley-lines through each cell of a board with side
+    length size, where ley-line i is bit i.
+
+    >>> cell_line_masks(1)
+    (21, 41, 38)
+    """
+    return tuple(sum(1 << line for line in lines)
+                 for lines in cell_lines(size))
+
+
+def popcount(mask: int) -> int:
+    """
+    Return the number of bits set in mask.
+
+    >>> popcount(0b10110)
+    3
+    """
+    return bin(mask).count('1')
+
+
+@lru_cache(maxsize=None)
+def symmetries(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return the symmetries of a board with side length size. A symmetry is a
+    tuple with one entry for each cell and then one for each ley-line; each
+    entry is the position, in the same order, of the cell or ley-line that
+    is moved there. The first symmetry leaves the board as it is.
+
+    >>> len(symmetries(2))
+    6
+    >>> symmetries(1)[1]
+    (0, 2, 1, 5, 6, 3, 4, 7, 8)
+    """
+    coordinates = cell_coordinates(size)
+    lines = ley_lines(size)
+    result = []
+    for order in permutations(range(3)):
+        source = [coordinates.index(tuple(coordinate[axis]
+                                          for axis in order))
+                  for coordinate in coordinates]
+        line_source = [len(source) + lines.index(tuple(sorted(
+            source[cell] for cell in line))) for line in lines]
+        result.append(tuple(source + line_source))
+    return tuple(result)
+
+
+def map_cell(size: int, cell: int, symmetry: int) -> int:
+    """
+    Return the cell that symmetry of a board with side length size moves
+    cell to.
+
+    >>> map_cell(1, 1, 1)
+    2
+    """
+    return symmetries(size)[symmetry].index(cell)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
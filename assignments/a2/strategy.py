@@ -5,11 +5,21 @@ NOTE: Make sure this file adheres to python-ta.
 Adjust the type annotations as needed, and implement both a recursive
 and an iterative version of minimax.
 """
-from typing import Any
+from typing import Any, Callable, Optional, Tuple
 from random import randint
-from copy import deepcopy
+from functools import partial
+from time import monotonic
 from game import Game
 from game_state import GameState
+from transposition_table import TranspositionTable
+from move_ordering import MoveOrderer
+
+# Scores of the states searched by recursive_strategy, kept between turns.
+TRANSPOSITION_TABLE = TranspositionTable(max_entries=1000000,
+                                         max_bytes=256 * 1024 * 1024)
+
+# Seconds iterative_deepening_strategy may spend choosing a move.
+TIME_BUDGET = 2.0
 
 # TODO: Adjust the type annotation as needed.
 
@@ -47,7 +57,7 @@ def rough_outcome_strategy(game: Any) -> Any:
     best_outcome = -2  # Temporarily -- just so we can replace this easily later
 
     # Get the move that results in the lowest rough_outcome for the opponent
-    for move in current_state.get_possible_moves():
+    for move in current_state.cached_moves():
         new_state = current_state.make_move(move)
 
         # We multiply the below by -1 since a state that's bad for the opponent
@@ -68,7 +78,7 @@ def recursive_strategy(game: Game) -> Any:
     """
     # player = game.current_state.get_current_player_name()
     # opponent = 'p1' if player == 'p2' else 'p2'
-    score_dict = get_score(game)
+    score_dict = get_score(game, TRANSPOSITION_TABLE)
     # recursion is used in helper function get_score
     move = ''
     if score_dict[1] != [] and score_dict[1] != ['over']:
@@ -77,43 +87,126 @@ def recursive_strategy(game: Game) -> Any:
         move = choose_random_move(score_dict[0])
     elif score_dict[-1] != [] and score_dict[-1] != ['over']:
         move = choose_random_move(score_dict[-1])
-    return game.str_to_move(str(move))
+    return move
 
 
-def get_score(game: Game) -> dict:
+def get_score(game: Game,
+              table: Optional[TranspositionTable] = None) -> dict:
     """
     Return a score of the game's current state, either '-1', '0' or '1',
     using recursion.
+
+    If table is given, the scores of states already in table are not
+    searched again, and the scores of newly searched states are added to it.
+    """
+    return get_state_score(game.current_state, table)
+
+
+def get_state_score(state: GameState,
+                    table: Optional[TranspositionTable] = None) -> dict:
+    """
+    Return a dictionary from each score, either '-1', '0' or '1', to the
+    moves from state that guarantee that score for the current player, using
+    recursion. If the game is over at state, its score maps to ['over'].
+
+    table is used as in get_score. The states after the moves from state
+    are made with make_move, so state itself is never changed.
     """
     score_dict = {-1: [], 0: [], 1: []}
-    if game.is_over(game.current_state):
-        player = game.current_state.get_current_player_name()
-        opponent = 'p1' if player == 'p2' else 'p2'  # revised here after due :(
-        if game.is_winner(player):
-            score = 1
-        elif game.is_winner(opponent):
-            score = -1
-        else:
-            score = 0
+    score = over_score(state)
+    if score is not None:
         score_dict[score].append('over')
     else:
-        moves = game.current_state.get_possible_moves()
-        for move in moves:
-            move_to_make = game.str_to_move(str(move))
-            game_copy = deepcopy(game)
-            game_copy.current_state = game.current_state.make_move(move_to_make)
-            next_score_dict = get_score(game_copy)
-            oppo_score = -1000  # some invalid number at this point
-            if next_score_dict[1] != []:
-                oppo_score = 1
-            elif next_score_dict[0] != []:
-                oppo_score = 0
-            elif next_score_dict[-1] != []:
-                oppo_score = -1
+        for move in state.cached_moves():
+            oppo_score = table_score(state.make_move(move), table)
             score_dict[-1 * oppo_score].append(move)
     return score_dict
 
 
+def table_score(state: GameState,
+                table: Optional[TranspositionTable] = None) -> int:
+    """
+    Return the highest guaranteed score for the current player of state,
+    using recursion. If table is given, the score is taken from table if it
+    is there, and added to it otherwise.
+
+    Moves are applied to state in place if its game implements apply_move,
+    and taken back before this returns, even if the search is interrupted.
+    """
+    key = None
+    if table is not None:
+        key = state.canonical_key()
+        score = table.get(key)
+        if score is not None:
+            return score
+    score = over_score(state)
+    if score is None:
+        for move in state.cached_moves():
+            next_state, undo = descend(state, move)
+            try:
+                oppo_score = table_score(next_state, table)
+            finally:
+                ascend(state, undo)
+            if score is None or -1 * oppo_score > score:
+                score = -1 * oppo_score
+    if table is not None:
+        table.put(key, score)
+    return score
+
+
+def over_score(state: GameState) -> Optional[int]:
+    """
+    Return the score of the current player of state if the game is over at
+    state, otherwise return None.
+    """
+    return state.terminal_score()
+
+
+def descend(state: GameState, move: Any) -> Tuple[GameState, Any]:
+    """
+    Return the state after the valid move is applied to state, and what
+    ascend needs to go back to state. If the game of state implements
+    apply_move, state itself is changed in place; otherwise the new state
+    comes from make_move and state is left as it is.
+
+    >>> from subtract_square_state import SubtractSquareState
+    >>> state = SubtractSquareState(True, 9)
+    >>> child, undo = descend(state, 4)
+    >>> child is state, state.current_total
+    (True, 5)
+    >>> ascend(state, undo)
+    >>> state.current_total
+    9
+    """
+    if type(state).apply_move is GameState.apply_move:
+        return state.make_move(move), None
+    return state, state.apply_move(move)
+
+
+def ascend(state: GameState, undo: Any) -> None:
+    """
+    Take back the move that descend applied to state, where undo is what
+    descend returned with the new state.
+    """
+    if undo is not None:
+        state.undo_move(undo)
+
+
+def highest_score(score_dict: dict) -> int:
+    """
+    Return the highest score in score_dict that has at least one move.
+
+    >>> highest_score({-1: ['A'], 0: [], 1: ['B']})
+    1
+    >>> highest_score({-1: ['over'], 0: [], 1: []})
+    -1
+    """
+    for score in (1, 0, -1):
+        if score_dict[score] != []:
+            return score
+    return -1000  # some invalid number at this point
+
+
 def choose_random_move(score_list: list) -> str:
     """
     Return a move randomly chosen from moves that the new position has the same
@@ -127,11 +220,8 @@ def choose_random_move(score_list: list) -> str:
     >>> print(choose_random_move(score_list1) in expect_list1)
     True
     """
-    index = randint(0, len(score_list) - 1)
-    move = score_list[index]
-    while move == 'over':
-        move = score_list[index]
-    return move
+    moves = [move for move in score_list if move != 'over']
+    return moves[randint(0, len(moves) - 1)]
 
 
 def iterative_strategy(game: Game) -> Any:
@@ -142,30 +232,22 @@ def iterative_strategy(game: Game) -> Any:
     s = Stack()
     root = Box(game.current_state)
     s.add(root)
-    game0 = deepcopy(game)
     while not s.is_empty():
         cur = s.remove()
-        if game0.is_over(cur.state):
-            player = cur.state.get_current_player_name()
-            opponent = 'p1' if player == 'p2' else 'p2'
-            game0.current_state = cur.state
-            if game0.is_winner(player):
-                cur.highest_score = 1
-            elif game0.is_winner(opponent):
-                cur.highest_score = -1
-            else:
-                cur.highest_score = 0
+        score = over_score(cur.state)
+        if score is not None:
+            cur.highest_score = score
         else:
             if cur.children == []:
                 s.add(cur)
-                add_child(cur, s, game)
+                add_child(cur, s)
             else:
                 cur.highest_score = max([-1 * child.highest_score
                                          for child in cur.children])
     good_moves = [child.move for child in root.children
                   if child.highest_score == -1 * root.highest_score]
     index = randint(0, len(good_moves) - 1)
-    return game.str_to_move(str(good_moves[index]))
+    return good_moves[index]
 
 
 class Box:
@@ -237,20 +319,356 @@ class Stack:
         return len(self._storage) == 0
 
 
-def add_child(cur: Box, s: Stack, game: Game) -> None:
+def add_child(cur: Box, s: Stack) -> None:
     """
     Add every possible move for cur.state as a child to cur.children as well
     as to the top of s.
     """
     moves = cur.state.get_possible_moves()
     for move in moves:
-        next_state = \
-            cur.state.make_move(game.str_to_move(str(move)))
+        next_state = cur.state.make_move(move)
         child = Box(next_state, move)
         cur.children.append(child)
         s.add(child)
 
 
+class SearchStats:
+    """
+    Counters collected while a strategy searches a game tree.
+
+    nodes - the number of states visited
+    horizon_nodes - the number of visited states that were estimated with
+                    rough_outcome() instead of being searched further
+    depth - the deepest depth limit a search completed
+    """
+    nodes: int
+    horizon_nodes: int
+    depth: int
+
+    def __init__(self) -> None:
+        """
+        Initialize a SearchStats self with no states visited.
+        """
+        self.nodes = 0
+        self.horizon_nodes = 0
+        self.depth = 0
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of self.
+        >>> print(SearchStats())
+        0 nodes searched
+        """
+        return '{} nodes searched'.format(self.nodes)
+
+
+def best_moves(game: Game,
+               search: Callable[[GameState, int, int], int]) -> list:
+    """
+    Return every move from the current state of game that produces the
+    highest guaranteed score, scoring each resulting state with
+    search(state, alpha, beta).
+    """
+    state = game.current_state
+    best, moves = GameState.LOSE - 1, []
+    for move in state.cached_moves():
+        # Searching with alpha just below best keeps the exact score of
+        # every move that is as good as the best one so far.
+        score = -1 * search(state.make_move(move),
+                            -1 * (GameState.WIN + 1), -1 * (best - 1))
+        if score > best:
+            best, moves = score, [move]
+        elif score == best:
+            moves.append(move)
+    return moves
+
+
+def alphabeta_recursive_strategy(game: Game,
+                                 stats: Optional[SearchStats] = None,
+                                 orderer: Optional[MoveOrderer] = None) \
+        -> Any:
+    """
+    Return a move for game that produces a "highest guaranteed score" for the
+    current player using recursive minimax with alpha-beta pruning, trying
+    moves in the order given by orderer (a new MoveOrderer if None).
+    """
+    if orderer is None:
+        orderer = MoveOrderer()
+    search = partial(alphabeta_score, stats=stats, orderer=orderer, ply=1)
+    move = choose_random_move(best_moves(game, search))
+    return move
+
+
+def alphabeta_score(state: GameState, alpha: int, beta: int,
+                    stats: Optional[SearchStats] = None,
+                    orderer: Optional[MoveOrderer] = None,
+                    ply: int = 0) -> int:
+    """
+    Return the highest guaranteed score for the current player of state,
+    using recursion and skipping moves once a score of at least beta is
+    found. A result between alpha and beta is exact; a result of at most
+    alpha or at least beta is only a bound on the exact score.
+
+    If orderer is given, moves are tried in its order, and it is told which
+    moves caused cutoffs. ply is the number of moves from the root to state.
+
+    Moves are applied to state in place if its game implements apply_move,
+    and taken back before this returns, even if the search is interrupted,
+    leaving the moves state keeps as they were.
+    """
+    if stats is not None:
+        stats.nodes += 1
+    score = over_score(state)
+    if score is not None:
+        return score
+    moves = state.cached_moves()
+    if orderer is not None:
+        moves = orderer.order(state, moves, ply)
+    best = None
+    for move in moves:
+        next_state, undo = descend(state, move)
+        try:
+            score = -1 * alphabeta_score(next_state, -1 * beta, -1 * alpha,
+                                         stats, orderer, ply + 1)
+        finally:
+            ascend(state, undo)
+        if best is None or score > best:
+            best = score
+            alpha = max(alpha, score)
+        if alpha >= beta:
+            if orderer is not None:
+                orderer.record_cutoff(move, ply)
+            break
+    return best
+
+
+def alphabeta_iterative_strategy(game: Game,
+                                 stats: Optional[SearchStats] = None,
+                                 orderer: Optional[MoveOrderer] = None) \
+        -> Any:
+    """
+    Return a move for game that produces a "highest guaranteed score" for the
+    current player using a stack and alpha-beta pruning, trying moves in the
+    order given by orderer (a new MoveOrderer if None).
+    """
+    if orderer is None:
+        orderer = MoveOrderer()
+    search = partial(alphabeta_iterative_score, stats=stats, orderer=orderer,
+                     ply=1)
+    move = choose_random_move(best_moves(game, search))
+    return move
+
+
+class AlphaBetaBox(Box):
+    """
+    A Box that also holds the window (alpha, beta) its state is searched
+    with, the moves not searched yet, the Box it was reached from, the
+    number of moves (ply) from the root of the search and what ascend needs
+    to go back to the state of the parent (undo).
+    """
+    def __init__(self, state: GameState, move: Any = None,
+                 alpha: int = GameState.LOSE - 1,
+                 beta: int = GameState.WIN + 1,
+                 parent: Optional['AlphaBetaBox'] = None) -> None:
+        """
+        Initialize an AlphaBetaBox self, holding state, move, alpha, beta and
+        parent, whose moves are not generated yet.
+        Extends Box.__init__
+        """
+        Box.__init__(self, state, move)
+        self.alpha = alpha
+        self.beta = beta
+        self.parent = parent
+        self.moves = None
+        self.ply = 0 if parent is None else parent.ply + 1
+        self.undo = None
+
+    def update(self, score: int) -> None:
+        """
+        Record that one of the moves from self's state guarantees score.
+        >>> b = AlphaBetaBox(None)
+        >>> b.update(-1)
+        >>> b.update(0)
+        >>> b.highest_score, b.alpha
+        (0, 0)
+        """
+        if self.highest_score is None or score > self.highest_score:
+            self.highest_score = score
+            self.alpha = max(self.alpha, score)
+
+
+def alphabeta_iterative_score(state: GameState, alpha: int, beta: int,
+                              stats: Optional[SearchStats] = None,
+                              orderer: Optional[MoveOrderer] = None,
+                              ply: int = 0) -> int:
+    """
+    Return the highest guaranteed score for the current player of state,
+    using a stack instead of recursion and skipping moves once a score of at
+    least beta is found. A result between alpha and beta is exact; a result
+    of at most alpha or at least beta is only a bound on the exact score.
+
+    orderer and ply are used as in alphabeta_score.
+    """
+    s = Stack()
+    root = AlphaBetaBox(state, alpha=alpha, beta=beta)
+    root.ply = ply
+    s.add(root)
+    while not s.is_empty():
+        cur = s.remove()
+        if cur.moves is None:
+            if stats is not None:
+                stats.nodes += 1
+            cur.highest_score = over_score(cur.state)
+            cur.moves = [] if cur.highest_score is not None else \
+                list(cur.state.cached_moves())
+            if orderer is not None:
+                cur.moves = orderer.order(cur.state, cur.moves, cur.ply)
+            cur.moves.reverse()
+        if cur.moves != [] and cur.alpha < cur.beta:
+            move = cur.moves.pop()
+            s.add(cur)
+            next_state, undo = descend(cur.state, move)
+            child = AlphaBetaBox(next_state, move, -1 * cur.beta,
+                                 -1 * cur.alpha, cur)
+            child.undo = undo
+            s.add(child)
+        elif cur.parent is not None:
+            # The boxes are finished in depth-first order, so the parent's
+            # state is this box's state until its move is taken back.
+            ascend(cur.parent.state, cur.undo)
+            cur.parent.update(-1 * cur.highest_score)
+            if orderer is not None and cur.parent.alpha >= cur.parent.beta:
+                orderer.record_cutoff(cur.move, cur.parent.ply)
+    return root.highest_score
+
+
+class SearchTimeout(Exception):
+    """
+    Raised when a search is still running at its deadline.
+    """
+    pass
+
+
+def iterative_deepening_strategy(game: Game,
+                                 time_budget: float = TIME_BUDGET,
+                                 max_depth: Optional[int] = None,
+                                 stats: Optional[SearchStats] = None,
+                                 orderer: Optional[MoveOrderer] = None) \
+        -> Any:
+    """
+    Return a move for game found by alpha-beta searches limited to depth
+    1, 2, 3, ... moves ahead, estimating the states at the depth limit with
+    rough_outcome(). Return the best move of the deepest search completed
+    within time_budget seconds.
+
+    Moves are tried in the order given by orderer (a new MoveOrderer if
+    None), which keeps what it learns from one depth to the next.
+    """
+    deadline = monotonic() + time_budget
+    if orderer is None:
+        orderer = MoveOrderer()
+    state = game.current_state
+    moves = orderer.order(state, state.cached_moves(), 0)
+    best_move = moves[0]
+    depth = 1
+    while max_depth is None or depth <= max_depth:
+        iteration = SearchStats()
+        partial_result = []
+        try:
+            best_move, score = best_move_at_depth(state, moves, depth,
+                                                  deadline, iteration,
+                                                  partial_result, orderer)
+        except SearchTimeout:
+            # Without a completed search, a partly searched depth 1 is still
+            # better than no search at all.
+            if depth == 1 and partial_result != []:
+                best_move = partial_result[0]
+            break
+        finally:
+            if stats is not None:
+                stats.nodes += iteration.nodes
+                stats.horizon_nodes += iteration.horizon_nodes
+        if stats is not None:
+            stats.depth = depth
+        # A search that never used rough_outcome(), or found a forced win or
+        # loss, would give the same answer at any greater depth.
+        if iteration.horizon_nodes == 0 or score in (GameState.WIN,
+                                                     GameState.LOSE):
+            break
+        # Search the best move first next time, so it is kept on ties.
+        moves.remove(best_move)
+        moves.insert(0, best_move)
+        depth += 1
+    return best_move
+
+
+def best_move_at_depth(state: GameState, moves: list, depth: int,
+                       deadline: float, stats: SearchStats,
+                       partial_result: list,
+                       orderer: Optional[MoveOrderer] = None) \
+        -> Tuple[Any, float]:
+    """
+    Return the first move in moves with the highest score found by looking
+    depth moves ahead of state, and that score. After each move is searched,
+    partial_result holds the best move so far. orderer is used as in
+    alphabeta_score.
+    """
+    best_move, best = None, GameState.LOSE - 1
+    for move in moves:
+        score = -1 * depth_limited_score(state.make_move(move), depth - 1,
+                                         -1 * (GameState.WIN + 1), -1 * best,
+                                         deadline, stats, orderer, 1)
+        if score > best:
+            best_move, best = move, score
+            partial_result[:] = [move]
+    return best_move, best
+
+
+def depth_limited_score(state: GameState, depth: int, alpha: float,
+                        beta: float, deadline: float, stats: SearchStats,
+                        orderer: Optional[MoveOrderer] = None,
+                        ply: int = 0) -> float:
+    """
+    Return the highest guaranteed score for the current player of state,
+    looking at most depth moves ahead and using rough_outcome() for the
+    states after that. Moves are skipped once a score of at least beta is
+    found, and orderer and ply are used, as in alphabeta_score.
+
+    Raise SearchTimeout if this search is still running after deadline, as
+    given by time.monotonic().
+    """
+    stats.nodes += 1
+    score = over_score(state)
+    if score is not None:
+        return score
+    if monotonic() > deadline:
+        raise SearchTimeout()
+    if depth <= 0:
+        stats.horizon_nodes += 1
+        return state.rough_outcome()
+    moves = state.cached_moves()
+    if orderer is not None:
+        moves = orderer.order(state, moves, ply)
+    best = None
+    for move in moves:
+        next_state, undo = descend(state, move)
+        try:
+            score = -1 * depth_limited_score(next_state, depth - 1,
+                                             -1 * beta, -1 * alpha, deadline,
+                                             stats, orderer, ply + 1)
+        finally:
+            # state is put back even when the search runs out of time.
+            ascend(state, undo)
+        if best is None or score > best:
+            best = score
+            alpha = max(alpha, score)
+        if alpha >= beta:
+            if orderer is not None:
+                orderer.record_cutoff(move, ply, depth * depth)
+            break
+    return best
+
+
 if __name__ == "__main__":
     from python_ta import check_all
 
@@ -0,0 +1,667 @@
+"""
+Unittests for the minimax strategies in strategy.py.
+
+The pruned and cached strategies must choose moves from the same set of
+best moves that a full minimax search finds.
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from game_interface import playable_games
+from game_state import GameState
+from strategy import get_score, get_state_score, highest_score, best_moves, \
+    alphabeta_score, alphabeta_iterative_score, SearchStats, \
+    iterative_deepening_strategy
+from transposition_table import TranspositionTable
+from parallel_strategy import parallel_scores, shutdown_pool
+from mcts import MonteCarloTreeSearch
+from move_ordering import MoveOrderer
+import tablebase
+from tablebase import build_tablebase, Tablebase, tablebase_move, \
+    tablebase_strategy, tablebase_path, get_tablebase
+from subtract_square_state import SubtractSquareState
+from subtract_square_solver import SubtractSquareSolver, \
+    SubtractSquareSolutionFile, solver_strategy
+StonehengeGame = playable_games['h']
+SubtractSquareGame = playable_games['s']
+
+
+def new_game(game_class: type, user_input: str, moves: list) -> object:
+    """
+    Return a new game_class made with user_input, after applying moves.
+    """
+    with patch('builtins.input', return_value=user_input):
+        game = game_class(True)
+    for move in moves:
+        game.current_state = game.current_state.make_move(
+            game.str_to_move(move))
+    return game
+
+
+def full_minimax_moves(game: object) -> list:
+    """
+    Return the sorted best moves for game found by a full minimax search.
+    """
+    score_dict = get_score(game)
+    return sorted(score_dict[highest_score(score_dict)])
+
+
+class TestMinimax(unittest.TestCase):
+    """
+    Compare the moves chosen by each minimax variant with full minimax.
+    """
+    positions = [(SubtractSquareGame, '20', []),
+                 (SubtractSquareGame, '23', []),
+                 (StonehengeGame, '1', []),
+                 (StonehengeGame, '2', []),
+                 (StonehengeGame, '2', ['A', 'G']),
+                 (StonehengeGame, '2', ['D', 'A', 'C'])]
+
+    def test_transposition_table_same_moves(self):
+        """
+        Test that get_score with a transposition table finds the same best
+        moves as without one, and that the table is used.
+        """
+        table = TranspositionTable()
+        for game_class, user_input, moves in self.positions:
+            game = new_game(game_class, user_input, moves)
+            score_dict = get_score(game, table)
+            self.assertEqual(sorted(score_dict[highest_score(score_dict)]),
+                             full_minimax_moves(game))
+        self.assertGreater(table.hit_rate(), 0)
+
+    def test_transposition_table_bounded(self):
+        """
+        Test that a small transposition table never grows beyond its bound.
+        """
+        table = TranspositionTable(max_entries=10)
+        game = new_game(StonehengeGame, '2', [])
+        score_dict = get_score(game, table)
+        self.assertEqual(sorted(score_dict[highest_score(score_dict)]),
+                         full_minimax_moves(game))
+        self.assertEqual(len(table), 10)
+
+    def test_alphabeta_same_moves(self):
+        """
+        Test that both alpha-beta searches find the same best moves as full
+        minimax while visiting fewer states.
+        """
+        for search in (alphabeta_score, alphabeta_iterative_score):
+            for orderer in (None, MoveOrderer()):
+                for game_class, user_input, moves in self.positions:
+                    game = new_game(game_class, user_input, moves)
+                    found = best_moves(game, lambda s, a, b:
+                                       search(s, a, b, None, orderer, 1))
+                    self.assertEqual(sorted(found), full_minimax_moves(game))
+
+    def test_alphabeta_prunes(self):
+        """
+        Test that alpha-beta visits fewer states than there are in the game
+        tree of Stonehenge with a side-length of 2.
+        """
+        game = new_game(StonehengeGame, '2', [])
+        stats = SearchStats()
+        best_moves(game, lambda s, a, b: alphabeta_score(s, a, b, stats))
+        self.assertLess(stats.nodes, 5000)
+
+    def test_ordering_prunes_more(self):
+        """
+        Test that alpha-beta visits fewer states with move ordering than
+        without on a Stonehenge board with a side-length of 3.
+        """
+        game = new_game(StonehengeGame, '3', ['A', 'D', 'G'])
+        unordered, ordered = SearchStats(), SearchStats()
+        alphabeta_score(game.current_state, -2, 2, unordered)
+        alphabeta_score(game.current_state, -2, 2, ordered, MoveOrderer())
+        self.assertLess(ordered.nodes, unordered.nodes)
+
+
+class TestSymmetry(unittest.TestCase):
+    """
+    Test that Stonehenge states that are the same up to a symmetry of the
+    board share cache entries.
+    """
+    def test_symmetric_states(self):
+        """
+        Test that every symmetric image of a state has the same canonical
+        key, and that its best moves are the images of the best moves.
+        """
+        for moves in ([], ['A', 'G'], ['D', 'A', 'C'], ['B', 'C', 'F']):
+            state = new_game(StonehengeGame, '2', moves).current_state
+            best = full_minimax_moves(new_game(StonehengeGame, '2', moves))
+            for symmetry in range(6):
+                image = type(state).unpack(state.pack_symmetric(symmetry))
+                self.assertEqual(image.canonical_key(), state.canonical_key())
+                score_dict = get_state_score(image)
+                self.assertEqual(
+                    sorted(score_dict[highest_score(score_dict)]),
+                    sorted(state.symmetric_move(move, symmetry)
+                           for move in best))
+
+    def test_table_shares_entries(self):
+        """
+        Test that a transposition table filled from one state answers its
+        symmetric image without adding entries.
+        """
+        table = TranspositionTable()
+        state = new_game(StonehengeGame, '2', ['A']).current_state
+        get_state_score(state, table)
+        entries, misses = len(table), table.misses
+        get_state_score(type(state).unpack(state.pack_symmetric(3)), table)
+        self.assertEqual((len(table), table.misses), (entries, misses))
+
+
+class TestZobrist(unittest.TestCase):
+    """
+    Test the Zobrist hashes of Stonehenge states.
+    """
+    def test_incremental(self):
+        """
+        Test that the hashes, ley-line counts, threats and free cells
+        make_move updates equal the ones computed from scratch along random
+        games, and that the game ends when no moves are left.
+        """
+        random.seed(148)
+        for size in range(1, 5):
+            state = new_game(StonehengeGame, str(size), []).current_state
+            while not state.is_over():
+                state = state.make_move(
+                    random.choice(state.get_possible_moves()))
+                rebuilt = type(state)(state.p1_turn, size, state.cells,
+                                      state.ley_line_markers)
+                self.assertEqual(state.zobrist, rebuilt.zobrist)
+                self.assertEqual(state.line_counts, rebuilt.line_counts)
+                self.assertEqual(state.lines_claimed, rebuilt.lines_claimed)
+                self.assertEqual(state.threats, rebuilt.threats)
+                self.assertEqual(state.free_cells, rebuilt.free_cells)
+                self.assertEqual(state.is_over(),
+                                 state.get_possible_moves() == [])
+                self.assertEqual(state.terminal_score(),
+                                 GameState.terminal_score(state))
+
+    def test_same_in_other_process(self):
+        """
+        Test that another process with a different string hash seed gives
+        the same hash.
+        """
+        code = ('from stonehenge import StonehengeState, new_cells; '
+                'print(StonehengeState(True, 3, new_cells(3), '
+                '[["@"] * 4] * 3).make_move("E").state_key())')
+        output = subprocess.run(
+            [sys.executable, '-c', code], check=True, stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=dict(os.environ, PYTHONHASHSEED='1')).stdout
+        state = new_game(StonehengeGame, '3', ['E']).current_state
+        self.assertEqual(int(output), state.state_key())
+
+
+class TestApplyMove(unittest.TestCase):
+    """
+    Test applying and undoing moves in place.
+    """
+    def test_matches_make_move(self):
+        """
+        Test that apply_move gives the state make_move gives, and that
+        undo_move gives back the state before, along random games.
+        """
+        random.seed(148)
+        games = [(SubtractSquareGame, '50'), (playable_games['b'], '3')]
+        games += [(StonehengeGame, str(size)) for size in range(1, 5)]
+        for game_class, user_input in games:
+            state = new_game(game_class, user_input, []).current_state
+            while not state.is_over():
+                before = state.state_key(), str(state)
+                for move in state.get_possible_moves():
+                    child = state.make_move(move)
+                    undo = state.apply_move(move)
+                    self.assertEqual((state.state_key(), str(state)),
+                                     (child.state_key(), str(child)))
+                    state.undo_move(undo)
+                    self.assertEqual((state.state_key(), str(state)), before)
+                state = state.make_move(
+                    random.choice(state.get_possible_moves()))
+
+    def test_cached_moves(self):
+        """
+        Test that the moves of a state are found once and kept, and that
+        applying and undoing a move in place updates them.
+        """
+        for game_class, user_input in [(SubtractSquareGame, '20'),
+                                       (StonehengeGame, '2'),
+                                       (playable_games['b'], '2')]:
+            state = new_game(game_class, user_input, []).current_state
+            moves = state.cached_moves()
+            self.assertEqual(moves, state.get_possible_moves())
+            self.assertIs(state.cached_moves(), moves)
+            self.assertEqual(state.move_set(), frozenset(moves))
+            undo = state.apply_move(moves[-1])
+            self.assertEqual(state.cached_moves(),
+                             state.get_possible_moves())
+            self.assertNotEqual(state.cached_moves(), moves)
+            state.undo_move(undo)
+            self.assertEqual(state.cached_moves(), moves)
+            self.assertEqual(state.move_set(), frozenset(moves))
+
+    def test_same_scores(self):
+        """
+        Test that the searches give the same scores with and without
+        apply_move, and leave the searched state and its kept moves as they
+        were.
+        """
+        searches = [lambda s: alphabeta_score(s, -2, 2),
+                    lambda s: alphabeta_iterative_score(s, -2, 2),
+                    lambda s: get_state_score(s, TranspositionTable())]
+        for game_class, user_input, moves in TestMinimax.positions:
+            state = new_game(game_class, user_input, moves).current_state
+            key = state.state_key()
+            moves = state.cached_moves()
+            for search in searches:
+                in_place = search(state)
+                self.assertEqual(state.state_key(), key)
+                self.assertIs(state.cached_moves(), moves)
+                with patch.object(type(state), 'apply_move',
+                                  GameState.apply_move):
+                    self.assertEqual(search(state), in_place)
+
+
+    def test_interrupted(self):
+        """
+        Test that a recursive search stopped by an exception deep in the
+        tree leaves the searched state as it was.
+        """
+        class Interrupt(Exception):
+            """
+            Raised to stop a search.
+            """
+            pass
+
+        def interrupt(state, moves, ply):
+            """
+            Raise Interrupt at the third move from the root.
+            """
+            if ply == 3:
+                raise Interrupt
+            return moves
+
+        orderer = MoveOrderer()
+        for game_class, user_input in ((SubtractSquareGame, '20'),
+                                       (StonehengeGame, '2')):
+            state = new_game(game_class, user_input, []).current_state
+            key = state.state_key()
+            moves = state.cached_moves()
+            with patch.object(orderer, 'order', interrupt):
+                with self.assertRaises(Interrupt):
+                    alphabeta_score(state, -2, 2, orderer=orderer)
+            self.assertEqual(state.state_key(), key)
+            self.assertIs(state.cached_moves(), moves)
+
+
+class TestRoughOutcome(unittest.TestCase):
+    """
+    Test the Stonehenge rough outcome found from the threatened ley-lines.
+    """
+    def test_matches_lookahead(self):
+        """
+        Test that rough_outcome agrees with trying every move and every
+        reply along random games.
+        """
+        random.seed(148)
+        for size in range(1, 6):
+            for _ in range(20):
+                state = new_game(StonehengeGame, str(size), []).current_state
+                while not state.is_over():
+                    self.assertEqual(state.rough_outcome(),
+                                     lookahead_outcome(state))
+                    state = state.make_move(
+                        random.choice(state.get_possible_moves()))
+
+
+def lookahead_outcome(state: object) -> int:
+    """
+    Return WIN if a move from the Stonehenge state claims half of the
+    ley-lines, LOSE if the opponent can do so after every move, and DRAW
+    otherwise, by trying every move and every reply.
+    """
+    half = 3 * (state.size + 1) / 2
+
+    def can_win(current: object) -> bool:
+        """
+        Return whether a move from current claims half of the ley-lines.
+        """
+        mine = 0 if current.p1_turn else 1
+        return any(current.make_move(move).lines_claimed[mine] >= half
+                   for move in current.get_possible_moves())
+    if can_win(state):
+        return GameState.WIN
+    if all(can_win(state.make_move(move))
+           for move in state.get_possible_moves()):
+        return GameState.LOSE
+    return GameState.DRAW
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Test the root-parallel strategy.
+    """
+    def tearDown(self):
+        """
+        Stop the worker processes started by a test.
+        """
+        shutdown_pool()
+
+    def test_same_moves(self):
+        """
+        Test that the moves scored best by the worker processes are the best
+        moves found by full minimax, with pools of 1 and 2 workers.
+        """
+        for workers in (1, 2):
+            for game_class, user_input, moves in TestMinimax.positions:
+                game = new_game(game_class, user_input, moves)
+                scores = parallel_scores(game.current_state, workers)
+                best = max(scores.values())
+                self.assertEqual(sorted(move for move in scores
+                                        if scores[move] == best),
+                                 full_minimax_moves(game))
+
+
+class TestIterativeDeepening(unittest.TestCase):
+    """
+    Test the depth-limited strategy with a time budget.
+    """
+    def test_finds_best_move(self):
+        """
+        Test that with enough time iterative deepening picks one of the best
+        moves found by full minimax.
+        """
+        for game_class, user_input, moves in TestMinimax.positions:
+            game = new_game(game_class, user_input, moves)
+            move = iterative_deepening_strategy(game, time_budget=60)
+            self.assertIn(move, full_minimax_moves(game))
+
+    def test_time_budget(self):
+        """
+        Test that iterative deepening returns a valid move within its time
+        budget on a board too large to search completely.
+        """
+        game = new_game(StonehengeGame, '4', [])
+        start = time.monotonic()
+        move = iterative_deepening_strategy(game, time_budget=0.5)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertTrue(game.current_state.is_valid_move(move))
+
+
+class TestMonteCarloTreeSearch(unittest.TestCase):
+    """
+    Test the Monte Carlo tree search.
+    """
+    def setUp(self):
+        """
+        Make the random playouts the same on every run.
+        """
+        random.seed(148)
+
+    def test_finds_best_move(self):
+        """
+        Test that MCTS picks one of the best moves found by full minimax on
+        Stonehenge positions where only some moves are best.
+        """
+        for moves in (['A', 'D', 'G'], ['B', 'F', 'K']):
+            game = new_game(StonehengeGame, '3', moves)
+            search = MonteCarloTreeSearch()
+            move = search.search(game.current_state, playouts=3000)
+            self.assertIn(move, full_minimax_moves(game))
+            self.assertEqual(search.playouts, 3000)
+            self.assertGreater(search.playouts_per_second(), 0)
+
+    def test_large_board(self):
+        """
+        Test that MCTS picks a valid move on a board with more than 26
+        cells, whose labels have two letters.
+        """
+        game = new_game(StonehengeGame, '8', ['A', 'AA', 'AZ'])
+        move = MonteCarloTreeSearch().search(game.current_state,
+                                             playouts=200)
+        self.assertTrue(game.current_state.is_valid_move(move))
+
+    def test_no_time(self):
+        """
+        Test that a search with no time left still returns a valid move.
+        """
+        game = new_game(StonehengeGame, '3', [])
+        search = MonteCarloTreeSearch()
+        move = search.search(game.current_state, playouts=None,
+                             time_budget=0)
+        self.assertTrue(game.current_state.is_valid_move(move))
+        self.assertEqual(search.playouts, 1)
+
+    def test_reuses_tree(self):
+        """
+        Test that the tree is kept after our move and the opponent's reply.
+        """
+        game = new_game(StonehengeGame, '3', [])
+        search = MonteCarloTreeSearch()
+        move = search.search(game.current_state, playouts=500)
+        state = game.current_state.make_move(move)
+        state = state.make_move(state.get_possible_moves()[0])
+        search.search(state, playouts=100)
+        self.assertGreater(search.reused, 0)
+        self.assertEqual(search.root.visits, search.reused + 100)
+
+
+class TestTablebase(unittest.TestCase):
+    """
+    Test a tablebase for Stonehenge with a side-length of 2.
+    """
+    def setUp(self):
+        """
+        Build the tablebase in a temporary directory.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.table = Tablebase(build_tablebase(2, self.directory.name))
+
+    def tearDown(self):
+        """
+        Remove the tablebase.
+        """
+        self.table.close()
+        self.directory.cleanup()
+
+    def test_matches_minimax(self):
+        """
+        Test that the tablebase agrees with full minimax on who wins, and
+        that its move is one of the best moves.
+        """
+        for moves in ([], ['A', 'G'], ['D', 'A', 'C'], ['B', 'C', 'F']):
+            game = new_game(StonehengeGame, '2', moves)
+            score_dict = get_score(game)
+            wins, _ = self.table.lookup(game.current_state)
+            self.assertEqual(wins, highest_score(score_dict) == 1)
+            self.assertIn(tablebase_move(game.current_state, self.table),
+                          full_minimax_moves(game))
+
+    def test_unreachable_state(self):
+        """
+        Test that a state of another side length is not in the tablebase.
+        """
+        game = new_game(StonehengeGame, '1', [])
+        self.assertIsNone(self.table.lookup(game.current_state))
+
+    def test_no_tablebase(self):
+        """
+        Test that tablebase_strategy returns a valid move within its time
+        budget on a board too large to have a tablebase.
+        """
+        game = new_game(StonehengeGame, '6', [])
+        start = time.monotonic()
+        move = tablebase_strategy(game, time_budget=0.5)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertTrue(game.current_state.is_valid_move(move))
+
+    def test_invalid_file(self):
+        """
+        Test that a file too short to hold a header, or with another magic
+        number, is rejected, and that get_tablebase treats it as missing
+        until the tablebase is built.
+        """
+        path = tablebase_path(1, self.directory.name)
+        with patch.object(tablebase, 'TABLEBASE_DIR', self.directory.name), \
+                patch.dict(tablebase._tablebases, clear=True):
+            self.assertIsNone(get_tablebase(1))
+            for data in (b'abc', b'\0' * 64):
+                with open(path, 'wb') as file:
+                    file.write(data)
+                with self.assertRaises(ValueError):
+                    Tablebase(path)
+                self.assertIsNone(get_tablebase(1))
+            build_tablebase(1, self.directory.name)
+            table = get_tablebase(1)
+            self.assertEqual(table.size, 1)
+            table.close()
+
+
+class TestSubtractSquareState(unittest.TestCase):
+    """
+    Test the moves of Subtract Square states.
+    """
+    def test_moves(self):
+        """
+        Test that the moves and valid moves are the squares up to the total.
+        """
+        for total in range(200):
+            state = SubtractSquareState(True, total)
+            squares = [n * n for n in range(1, total + 1) if n * n <= total]
+            self.assertEqual(state.get_possible_moves(), squares)
+            self.assertEqual([move for move in range(-1, total + 2)
+                              if state.is_valid_move(move)], squares)
+
+    def test_large_total(self):
+        """
+        Test the moves and rough outcome of a total too large for floats to
+        tell squares apart.
+        """
+        total = 10 ** 12
+        state = SubtractSquareState(True, total + 1)
+        self.assertEqual(len(state.get_possible_moves()), 10 ** 6)
+        self.assertTrue(state.is_valid_move(total))
+        self.assertFalse(state.is_valid_move(total + 1))
+        self.assertEqual(state.rough_outcome(), GameState.DRAW)
+        square = (10 ** 17 + 3) ** 2
+        self.assertTrue(SubtractSquareState(True, square).is_valid_move(
+            square))
+        self.assertEqual(SubtractSquareState(True, total).rough_outcome(),
+                         GameState.WIN)
+
+
+class TestSubtractSquareSolver(unittest.TestCase):
+    """
+    Test the dynamic-programming solver for Subtract Square.
+    """
+    def test_matches_minimax(self):
+        """
+        Test that the solver agrees with minimax on every total up to 40,
+        and that solver_strategy picks one of the best moves.
+        """
+        solver = SubtractSquareSolver()
+        table = TranspositionTable()
+        for total in range(1, 41):
+            game = new_game(SubtractSquareGame, str(total), [])
+            score_dict = get_score(game, table)
+            self.assertEqual(solver.is_win(total),
+                             highest_score(score_dict) == 1)
+            if solver.is_win(total):
+                with patch('subtract_square_solver.SOLVER', solver):
+                    self.assertIn(solver_strategy(game),
+                                  score_dict[highest_score(score_dict)])
+
+    def test_grows_on_demand(self):
+        """
+        Test that a table grown in steps equals one solved at once.
+        """
+        grown = SubtractSquareSolver()
+        for total in range(0, 5000, 37):
+            grown.ensure(total)
+        solved = SubtractSquareSolver(grown.limit)
+        self.assertEqual(grown.losing, solved.losing)
+
+    def test_other_games(self):
+        """
+        Test that solver_strategy returns a valid move within its time
+        budget for a large Stonehenge board.
+        """
+        game = new_game(StonehengeGame, '6', [])
+        start = time.monotonic()
+        move = solver_strategy(game, time_budget=0.5)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertTrue(game.current_state.is_valid_move(move))
+
+
+class TestSubtractSquareSolutionFile(unittest.TestCase):
+    """
+    Test the memory-mapped solution file for Subtract Square.
+    """
+    def setUp(self):
+        """
+        Make a temporary directory for the solution file.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name + '/solution.bits'
+
+    def tearDown(self):
+        """
+        Remove the solution file.
+        """
+        self.directory.cleanup()
+
+    def test_matches_solver(self):
+        """
+        Test that a file extended in steps agrees with the in-memory solver,
+        with and without NumPy.
+        """
+        solver = SubtractSquareSolver(5000)
+        for use_numpy in (True, False):
+            solution = SubtractSquareSolutionFile(self.path, use_numpy)
+            for total in range(0, 5000, 37):
+                solution.ensure(total)
+            self.assertEqual([total for total in range(5001)
+                              if not solution.is_win(total)],
+                             solver.losing)
+            solution.close()
+            self.tearDown()
+            self.setUp()
+
+    def test_shared(self):
+        """
+        Test that the file is kept when it is opened again, and that an
+        extension made through one mapping is seen by another.
+        """
+        first = SubtractSquareSolutionFile(self.path)
+        first.ensure(1000)
+        second = SubtractSquareSolutionFile(self.path)
+        self.assertEqual(second.limit, first.limit)
+        second.ensure(10000)
+        first.ensure(5000)
+        self.assertEqual(first.limit, second.limit)
+        self.assertEqual(first.winning_move(9000), second.winning_move(9000))
+        first.close()
+        second.close()
+
+    def test_not_solution_file(self):
+        """
+        Test that a file too short to hold a header, or with another magic
+        number, is rejected.
+        """
+        for data in (b'abc', b'\0' * 64):
+            with open(self.path, 'wb') as file:
+                file.write(data)
+            with self.assertRaises(ValueError):
+                SubtractSquareSolutionFile(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,388 @@
+"""
+A dynamic-programming solver for Subtract Square.
+
+Whether a total is a win for the current player only depends on the totals
+below it: it is a win iff some square can be subtracted to reach a losing
+total. The solver fills in this table for every total up to a limit, and
+grows it when a larger total is asked for.
+
+NumPy is used to mark many totals at once if it is installed; otherwise the
+solver falls back to plain Python, which is slower but gives the same
+table.
+
+SubtractSquareSolutionFile keeps the table on disk, one bit per total, so
+it is only computed once and every process can share it.
+"""
+import mmap
+import os
+import re
+import struct
+from math import isqrt
+from typing import Any, List, Optional
+from game import Game
+from subtract_square_state import SubtractSquareState
+from strategy import iterative_deepening_strategy, TIME_BUDGET
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# The file solver_strategy keeps its solved totals in.
+SOLUTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'tablebases', 'subtract_square.bits')
+
+MAGIC = b'SQSF'
+HEADER = struct.Struct('<4sQ')
+
+
+class SubtractSquareSolver:
+    """
+    The win/lose table of Subtract Square for every total from 0 to limit.
+
+    limit - the largest total solved so far
+    losing - the solved totals that are a loss for the current player, in
+             increasing order
+    """
+    limit: int
+    losing: List[int]
+
+    def __init__(self, limit: int = 0, use_numpy: bool = True) -> None:
+        """
+        Initialize a SubtractSquareSolver self, solving every total up to
+        limit. NumPy is only used if use_numpy is True and it is installed.
+
+        >>> SubtractSquareSolver(10).losing
+        [0, 2, 5, 7, 10]
+        """
+        self._numpy = numpy if use_numpy else None
+        self._wins = self._new_table(1)
+        self.limit = 0
+        self.losing = [0]
+        self.ensure(limit)
+
+    def _new_table(self, length: int) -> Any:
+        """
+        Return a table of length totals that are not known to be wins yet.
+        """
+        if self._numpy is not None:
+            return self._numpy.zeros(length, dtype=bool)
+        return bytearray(length)
+
+    def ensure(self, total: int) -> None:
+        """
+        Solve every total up to total if it is not solved yet. The table at
+        least doubles each time it grows, so solving totals one by one takes
+        linear time overall.
+        """
+        if total <= self.limit:
+            return
+        new_limit = max(total, 2 * self.limit)
+        wins = self._new_table(new_limit + 1)
+        wins[:self.limit + 1] = self._wins
+        wins[self.limit + 1:] = solve_range(self.losing, self.limit + 1,
+                                            new_limit, self._numpy)
+        self._wins = wins
+        self.limit = new_limit
+
+    def _win_at(self, total: int) -> bool:
+        """
+        Return whether the solved total is a win for the current player.
+        """
+        return bool(self._wins[total])
+
+    def is_win(self, total: int) -> bool:
+        """
+        Return whether total is a win for the current player.
+
+        >>> solver = SubtractSquareSolver()
+        >>> solver.is_win(4), solver.is_win(5), solver.limit
+        (True, False, 8)
+        """
+        self.ensure(total)
+        return self._win_at(total)
+
+    def winning_move(self, total: int) -> Optional[int]:
+        """
+        Return a square whose subtraction from total leaves a losing total
+        for the opponent, or None if total is a loss. This takes O(sqrt(N))
+        time once total is solved.
+
+        >>> solver = SubtractSquareSolver()
+        >>> solver.winning_move(11), solver.winning_move(10)
+        (1, None)
+        """
+        self.ensure(total)
+        for root in range(1, isqrt(total) + 1):
+            if not self._win_at(total - root * root):
+                return root * root
+        return None
+
+
+def solve_range(losing: List[int], start: int, end: int,
+                numpy_module: Any = None) -> Any:
+    """
+    Return the win/lose table for the totals from start to end, where losing
+    holds every losing total below start, and append the losing totals
+    found to losing. The table is a bytearray, or an array of bools if
+    numpy_module is the NumPy module.
+
+    >>> losing = [0, 2]
+    >>> list(solve_range(losing, 3, 8))
+    [1, 1, 0, 1, 0, 1]
+    >>> losing
+    [0, 2, 5, 7]
+    """
+    if numpy_module is not None:
+        wins = numpy_module.zeros(end - start + 1, dtype=bool)
+    else:
+        wins = bytearray(end - start + 1)
+    for losing_total in losing:
+        _mark_wins(wins, start, losing_total, start, numpy_module)
+    for n in range(start, end + 1):
+        if not wins[n - start]:
+            losing.append(n)
+            _mark_wins(wins, start, n, n + 1, numpy_module)
+    return wins
+
+
+def _mark_wins(wins: Any, base: int, losing_total: int, start: int,
+               numpy_module: Any) -> None:
+    """
+    Mark every total from start to the end of wins that is a square above
+    losing_total as a win, where wins[0] is the entry for total base.
+    """
+    end = base + len(wins) - 1
+    first = isqrt(max(start - losing_total - 1, 0)) + 1
+    last = isqrt(end - losing_total)
+    if first > last:
+        return
+    if numpy_module is not None:
+        roots = numpy_module.arange(first, last + 1, dtype=numpy_module.int64)
+        wins[losing_total - base + roots * roots] = True
+    else:
+        for root in range(first, last + 1):
+            wins[losing_total - base + root * root] = 1
+
+
+class SubtractSquareSolutionFile(SubtractSquareSolver):
+    """
+    A SubtractSquareSolver whose table is kept in a memory-mapped file, one
+    bit per total, after a header with the number of totals solved. When a
+    larger total is asked for, the new totals are solved and appended to the
+    file in place. Processes that map the same file share its pages through
+    the OS page cache, and a lock on the file stops two of them from
+    extending it at once.
+
+    Only the file is needed to answer queries, so losing is only read from
+    it when the file is extended.
+
+    path - the path of the file
+    """
+    path: str
+
+    def __init__(self, path: str, use_numpy: bool = True) -> None:
+        """
+        Initialize a SubtractSquareSolutionFile self by memory-mapping the
+        file at path, creating it if it does not exist. NumPy is only used
+        if use_numpy is True and it is installed. Raise ValueError if the
+        file at path is not a Subtract Square solution file.
+        """
+        self._numpy = numpy if use_numpy else None
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT), 'r+b')
+        self._map = None
+        self.limit = -1
+        self.losing = []
+        try:
+            with self._locked():
+                if os.fstat(self._file.fileno()).st_size == 0:
+                    self._file.write(HEADER.pack(MAGIC, 0))
+                    self._file.flush()
+                self._remap()
+        except ValueError:
+            self.close()
+            raise
+
+    def _locked(self) -> Any:
+        """
+        Return a context manager that holds an exclusive lock on the file of
+        self, or does nothing where file locks are not supported.
+        """
+        return _FileLock(self._file)
+
+    def _remap(self) -> None:
+        """
+        Map the whole file of self again and read how many totals it holds.
+        """
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+        magic, count = None, 0
+        if len(self._map) >= HEADER.size:
+            magic, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) < HEADER.size + count // 8:
+            raise ValueError('{} is not a Subtract Square solution '
+                             'file.'.format(self.path))
+        self.limit = count - 1
+
+    def ensure(self, total: int) -> None:
+        """
+        Solve every total up to total if it is not in the file yet, at least
+        doubling the number of totals in the file.
+
+        >>> import tempfile
+        >>> directory = tempfile.TemporaryDirectory()
+        >>> path = os.path.join(directory.name, 'solution.bits')
+        >>> solution = SubtractSquareSolutionFile(path)
+        >>> solution.is_win(100), solution.winning_move(10), solution.limit
+        (True, None, 103)
+        >>> solution.close()
+        >>> reopened = SubtractSquareSolutionFile(path)
+        >>> reopened.limit
+        103
+        >>> reopened.close()
+        >>> directory.cleanup()
+        """
+        if total <= self.limit:
+            return
+        with self._locked():
+            # Another process may have extended the file already.
+            self._remap()
+            if total <= self.limit:
+                return
+            count = self.limit + 1
+            new_count = max(total + 1, 2 * count)
+            new_count += -new_count % 8
+            self.losing = self._read_losing()
+            wins = solve_range(self.losing, count, new_count - 1,
+                               self._numpy)
+            self._file.seek(HEADER.size + count // 8)
+            self._file.write(_pack_bits(wins, self._numpy))
+            self._file.flush()
+            # Readers only look at totals below the count in the header, so
+            # it is only updated once the new bits are written.
+            self._file.seek(0)
+            self._file.write(HEADER.pack(MAGIC, new_count))
+            self._file.flush()
+            self._remap()
+
+    def _read_losing(self) -> List[int]:
+        """
+        Return the losing totals in the file of self, in increasing order.
+        """
+        losing = []
+        bits = self._map[HEADER.size:HEADER.size + (self.limit + 1) // 8]
+        # Almost every total is a win, so only bytes with a 0 bit are read.
+        for match in re.finditer(b'[^\xff]', bits):
+            byte, total = match.group()[0], match.start() * 8
+            for bit in range(8):
+                if not byte >> bit & 1:
+                    losing.append(total + bit)
+        return losing
+
+    def _win_at(self, total: int) -> bool:
+        """
+        Return whether the solved total is a win for the current player.
+        """
+        return bool(self._map[HEADER.size + total // 8] >> (total % 8) & 1)
+
+    def close(self) -> None:
+        """
+        Unmap and close the file of self.
+        """
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class _FileLock:
+    """
+    An exclusive lock on an open file, held inside a with statement.
+    """
+    def __init__(self, file: Any) -> None:
+        """
+        Initialize a _FileLock self for the open file.
+        """
+        self._file = file
+
+    def __enter__(self) -> None:
+        """
+        Wait for and take the lock.
+        """
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """
+        Release the lock.
+        """
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+
+def _pack_bits(wins: Any, numpy_module: Any) -> bytes:
+    """
+    Return wins packed into bytes, with the first total in the lowest bit of
+    the first byte.
+
+    Precondition: len(wins) is a multiple of 8.
+
+    >>> _pack_bits(bytearray([1, 0, 1, 0, 0, 0, 0, 0]), None)
+    b'\\x05'
+    """
+    if numpy_module is not None:
+        return numpy_module.packbits(wins, bitorder='little').tobytes()
+    packed = bytearray(len(wins) // 8)
+    for i in range(len(packed)):
+        byte = 0
+        for bit in range(8):
+            if wins[8 * i + bit]:
+                byte |= 1 << bit
+        packed[i] = byte
+    return bytes(packed)
+
+
+# The solution file used by solver_strategy, mapped on first use.
+SOLVER = None
+
+
+def get_solver() -> SubtractSquareSolver:
+    """
+    Return the solver used by solver_strategy: the solution file at
+    SOLUTION_PATH, or an in-memory SubtractSquareSolver if that file cannot
+    be opened.
+    """
+    global SOLVER
+    if SOLVER is None:
+        try:
+            SOLVER = SubtractSquareSolutionFile(SOLUTION_PATH)
+        except (OSError, ValueError):
+            SOLVER = SubtractSquareSolver()
+    return SOLVER
+
+
+def solver_strategy(game: Game, time_budget: float = TIME_BUDGET) -> Any:
+    """
+    Return a winning move for a game of Subtract Square if there is one,
+    otherwise subtract 1 to make the game last as long as possible. Other
+    games are played with iterative_deepening_strategy within time_budget
+    seconds.
+    """
+    state = game.current_state
+    if not isinstance(state, SubtractSquareState):
+        return iterative_deepening_strategy(game, time_budget)
+    move = get_solver().winning_move(state.current_total)
+    return 1 if move is None else move
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
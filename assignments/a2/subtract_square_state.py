@@ -3,9 +3,14 @@ An implementation of a state for SubtractSquare.
 
 NOTE: You do not have to run python-ta on this file.
 """
-from typing import Any
+from math import isqrt
+from typing import Any, List, Optional
 from game_state import GameState
 
+# The squares 1, 4, 9, ... found so far, shared by all states and grown when
+# a larger total needs them.
+SQUARES = []
+
 
 class SubtractSquareState(GameState):
     """
@@ -29,13 +34,44 @@ class SubtractSquareState(GameState):
     def get_possible_moves(self) -> list:
         """
         Return all possible moves that can be applied to this state.
+
+        >>> SubtractSquareState(True, 10).get_possible_moves()
+        [1, 4, 9]
+        """
+        return squares_up_to(self.current_total)
+
+    def is_over(self) -> bool:
+        """
+        Return whether or not the game is over at this state.
+
+        >>> SubtractSquareState(True, 0).is_over()
+        True
         """
-        moves = []
-        for i in range(1, self.current_total + 1):
-            if i ** 2 <= self.current_total:
-                moves.append(i ** 2)
+        return self.current_total == 0
 
-        return moves
+    def is_winner(self, player: str) -> bool:
+        """
+        Return whether player has won the game at this state, i.e. whether
+        player subtracted to 0.
+
+        Precondition: player is 'p1' or 'p2'.
+
+        >>> SubtractSquareState(True, 0).is_winner('p2')
+        True
+        """
+        return self.get_current_player_name() != player and self.is_over()
+
+    def terminal_score(self) -> Optional[int]:
+        """
+        Return LOSE if the game is over at this state, since the other
+        player subtracted to 0, otherwise None.
+
+        >>> SubtractSquareState(True, 0).terminal_score()
+        -1
+        >>> SubtractSquareState(True, 4).terminal_score() is None
+        True
+        """
+        return self.LOSE if self.current_total == 0 else None
 
     def make_move(self, move: Any) -> "SubtractSquareState":
         """
@@ -47,7 +83,37 @@ class SubtractSquareState(GameState):
         new_state = SubtractSquareState(not self.p1_turn,
                                         self.current_total - move)
         return new_state
-    
+
+    def apply_move(self, move: Any) -> tuple:
+        """
+        Subtract the valid move from the total of this state in place and
+        pass the turn, returning the amount subtracted and the moves this
+        state kept.
+
+        >>> state = SubtractSquareState(True, 9)
+        >>> undo = state.apply_move(4)
+        >>> state.state_key()
+        (False, 5)
+        >>> state.undo_move(undo)
+        >>> state.state_key()
+        (True, 9)
+        """
+        if type(move) == str:
+            move = int(move)
+        self.current_total -= move
+        self.p1_turn = not self.p1_turn
+        return move, self.forget_moves()
+
+    def undo_move(self, undo: tuple) -> None:
+        """
+        Add back the amount in undo subtracted by apply_move, give the turn
+        back and keep the moves in undo again.
+        """
+        move, kept = undo
+        self.current_total += move
+        self.p1_turn = not self.p1_turn
+        self.restore_moves(kept)
+
     def is_valid_move(self, move):
         """
         Return whether move is a valid move for this GameState.
@@ -60,8 +126,20 @@ class SubtractSquareState(GameState):
         if type(move) == str:
             move = int(move)
 
-        return move in self.get_possible_moves()
+        return (isinstance(move, int) and move <= self.current_total
+                and is_pos_square(move))
     
+    def immediate_gain(self, move: Any) -> int:
+        """
+        Return 1 if move subtracts to 0 and wins the game, otherwise 0.
+
+        >>> SubtractSquareState(True, 9).immediate_gain(9)
+        1
+        >>> SubtractSquareState(True, 9).immediate_gain(4)
+        0
+        """
+        return 1 if move == self.current_total else 0
+
     def __repr__(self) -> str:
         """
         Return a representation of this state (which can be used for
@@ -70,6 +148,36 @@ class SubtractSquareState(GameState):
         return "P1's Turn: {} - Total: {}".format(self.p1_turn,
                                                   self.current_total)
 
+    def state_key(self) -> tuple:
+        """
+        Return a hashable key that is equal for two states iff they have the
+        same total and the same current player.
+
+        >>> SubtractSquareState(True, 9).state_key()
+        (True, 9)
+        """
+        return self.p1_turn, self.current_total
+
+    def pack(self) -> int:
+        """
+        Return this state packed into a single int: the total, followed by
+        one bit for whether it is p1's turn.
+
+        >>> SubtractSquareState(True, 9).pack()
+        19
+        """
+        return self.current_total << 1 | int(self.p1_turn)
+
+    @classmethod
+    def unpack(cls, packed: int) -> 'SubtractSquareState':
+        """
+        Return the SubtractSquareState that was packed into packed.
+
+        >>> SubtractSquareState.unpack(19).state_key()
+        (True, 9)
+        """
+        return cls(bool(packed & 1), packed >> 1)
+
     def rough_outcome(self) -> float:
         """
         Return an estimate in interval [LOSE, WIN] of best outcome the current
@@ -80,9 +188,8 @@ class SubtractSquareState(GameState):
         
         if is_pos_square(self.current_total):
             return self.WIN
-        elif all([is_pos_square(self.current_total - n ** 2)
-                  for n in range(1, self.current_total + 1)
-                  if n ** 2 < self.current_total]):
+        elif all(is_pos_square(self.current_total - root * root)
+                 for root in range(1, isqrt(self.current_total) + 1)):
             return self.LOSE
 
         return self.DRAW
@@ -90,14 +197,30 @@ class SubtractSquareState(GameState):
 
 def is_pos_square(n: int) -> bool:
     """
-    Return whether n is a positive perfect square
+    Return whether n is a positive perfect square, using exact integer
+    arithmetic so large n are not rounded.
 
     >>> is_pos_square(5)
     False
     >>> is_pos_square(9)
     True
+    >>> is_pos_square(10 ** 30 + 1)
+    False
+    """
+    return 0 < n and isqrt(n) ** 2 == n
+
+
+def squares_up_to(total: int) -> List[int]:
+    """
+    Return a new list of the positive squares up to total, in increasing
+    order, growing SQUARES if needed.
+
+    >>> squares_up_to(20)
+    [1, 4, 9, 16]
     """
-    return 0 < n and (round(n ** 0.5) ** 2 == n)
+    root = isqrt(max(total, 0))
+    SQUARES.extend(n * n for n in range(len(SQUARES) + 1, root + 1))
+    return SQUARES[:root]
 
 
 if __name__ == "__main__":
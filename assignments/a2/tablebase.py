@@ -0,0 +1,238 @@
+"""
+Stonehenge tablebases: the solved value of every reachable state of a small
+board, stored in a compact binary file.
+
+A tablebase is built once by build_tablebase (or by running this module),
+then tablebase_strategy answers from the file without searching. States
+that are the same up to a symmetry of the board share one entry, keyed by
+the packed state from StonehengeState.canonical_form. The file holds a
+header, the sorted keys as 8-byte integers, then one value byte per key:
+the high bit is set if the current player wins, and the other bits hold
+the number of moves left until the game ends when the winner wins as fast
+as possible and the loser loses as slowly as possible.
+"""
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+from game import Game
+from stonehenge import StonehengeState, new_cells
+from stonehenge_bitboard import BitboardStonehengeState
+from strategy import iterative_deepening_strategy, TIME_BUDGET
+
+# The directory tablebase_strategy loads tablebases from.
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'tablebases')
+# The largest side length whose packed states fit in 8 bytes.
+MAX_SIZE = 3
+
+MAGIC = b'STTB'
+HEADER = struct.Struct('<4sII')
+KEY = struct.Struct('<Q')
+WIN_BIT = 0x80
+
+
+def tablebase_path(size: int, directory: str = TABLEBASE_DIR) -> str:
+    """
+    Return the path of the tablebase for side length size in directory.
+
+    >>> os.path.basename(tablebase_path(2))
+    'stonehenge_2.tb'
+    """
+    return os.path.join(directory, 'stonehenge_{}.tb'.format(size))
+
+
+def table_key(state: StonehengeState) -> int:
+    """
+    Return the key of state in a tablebase: the smallest packed state that
+    a symmetry of the board moves state to.
+    """
+    return state.canonical_form()[0]
+
+
+def reachable_layers(size: int) -> List[set]:
+    """
+    Return the keys (see table_key) of the states reachable from a new board
+    with side length size, with either player to start, grouped into one set
+    per number of claimed cells.
+    """
+    layer = set()
+    for p1_turn in (True, False):
+        state = StonehengeState(p1_turn, size, new_cells(size),
+                                [['@'] * (size + 1) for _ in range(3)])
+        layer.add(table_key(state))
+    layers = []
+    while layer != set():
+        layers.append(layer)
+        next_layer = set()
+        for packed in layer:
+            state = StonehengeState.unpack(packed)
+            if not state.is_over():
+                for move in state.cached_moves():
+                    next_layer.add(table_key(state.make_move(move)))
+        layer = next_layer
+    return layers
+
+
+def solve(size: int) -> Dict[int, int]:
+    """
+    Return a dictionary from the key of every state reachable on
+    a board with side length size to its value byte, working backwards from
+    the states where the most cells are claimed.
+
+    >>> values = solve(1)
+    >>> len(values)
+    4
+    >>> state = StonehengeState(True, 1, new_cells(1), [['@'] * 2] * 3)
+    >>> values[table_key(state)] == WIN_BIT | 1
+    True
+    """
+    values = {}
+    # Every move claims a cell, so the states a state leads to are all in
+    # the next layer, which is already solved.
+    for layer in reversed(reachable_layers(size)):
+        for packed in layer:
+            state = StonehengeState.unpack(packed)
+            if state.is_over():
+                values[packed] = 0
+                continue
+            children = [values[table_key(state.make_move(move))]
+                        for move in state.cached_moves()]
+            losses = [value for value in children if not value & WIN_BIT]
+            if losses != []:
+                values[packed] = WIN_BIT | (min(losses) + 1)
+            else:
+                values[packed] = max(value & ~WIN_BIT
+                                     for value in children) + 1
+    return values
+
+
+def build_tablebase(size: int, directory: str = TABLEBASE_DIR) -> str:
+    """
+    Solve every reachable state of a Stonehenge board with side length size,
+    write the tablebase file into directory and return its path.
+    """
+    if not 1 <= size <= MAX_SIZE:
+        raise ValueError('Tablebases only fit side lengths 1 to {}.'.format(
+            MAX_SIZE))
+    values = solve(size)
+    keys = sorted(values)
+    os.makedirs(directory, exist_ok=True)
+    path = tablebase_path(size, directory)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, size, len(keys)))
+        f.write(struct.pack('<{}Q'.format(len(keys)), *keys))
+        f.write(bytes(values[key] for key in keys))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class Tablebase:
+    """
+    A memory-mapped tablebase file. Lookups binary search the sorted states
+    in the file, so only the pages they touch are read from disk.
+
+    size - the side length of the boards in this tablebase
+    count - the number of states in this tablebase
+    """
+    size: int
+    count: int
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize a Tablebase self by memory-mapping the file at path.
+        Raise ValueError if the file is not a Stonehenge tablebase.
+        """
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self.count = None, 0, 0
+        if len(self._map) >= HEADER.size:
+            magic, self.size, self.count = HEADER.unpack_from(self._map, 0)
+        self._values = HEADER.size + KEY.size * self.count
+        if magic != MAGIC or len(self._map) < self._values + self.count:
+            self._map.close()
+            raise ValueError('{} is not a Stonehenge tablebase.'.format(path))
+
+    def value(self, state: StonehengeState) -> Optional[int]:
+        """
+        Return the value byte of state, or None if state is not in self.
+        """
+        key = table_key(state)
+        low, high = 0, self.count - 1
+        while low <= high:
+            mid = (low + high) // 2
+            found = KEY.unpack_from(self._map, HEADER.size + KEY.size * mid)[0]
+            if found < key:
+                low = mid + 1
+            elif found > key:
+                high = mid - 1
+            else:
+                return self._map[self._values + mid]
+        return None
+
+    def lookup(self, state: StonehengeState) -> Optional[Tuple[bool, int]]:
+        """
+        Return whether the current player of state wins with perfect play,
+        and the number of moves until the game ends, or None if state is not
+        in self.
+        """
+        value = self.value(state)
+        if value is None:
+            return None
+        return bool(value & WIN_BIT), value & ~WIN_BIT
+
+    def close(self) -> None:
+        """
+        Unmap the file of self.
+        """
+        self._map.close()
+
+
+_tablebases = {}
+
+
+def get_tablebase(size: int) -> Optional[Tablebase]:
+    """
+    Return the tablebase for side length size from TABLEBASE_DIR, or None if
+    it has not been built or cannot be read. Only the tablebases that load
+    are kept, so one built later is still found.
+    """
+    if size not in _tablebases:
+        try:
+            _tablebases[size] = Tablebase(tablebase_path(size, TABLEBASE_DIR))
+        except (OSError, ValueError):
+            return None
+    return _tablebases[size]
+
+
+def tablebase_move(state: StonehengeState, table: Tablebase) -> Any:
+    """
+    Return the move from state that table shows to be best: the fastest win
+    if there is one, otherwise the slowest loss.
+    """
+    best_move, best_rank = None, None
+    for move in state.cached_moves():
+        opponent_wins, moves_left = table.lookup(state.make_move(move))
+        rank = -1 * moves_left if opponent_wins else moves_left - 1000
+        if best_rank is None or rank < best_rank:
+            best_move, best_rank = move, rank
+    return best_move
+
+
+def tablebase_strategy(game: Game, time_budget: float = TIME_BUDGET) -> Any:
+    """
+    Return a perfect move for game from its tablebase, or the move chosen by
+    iterative_deepening_strategy within time_budget seconds if there is no
+    tablebase for game, as for every board larger than MAX_SIZE.
+    """
+    state = game.current_state
+    if isinstance(state, (StonehengeState, BitboardStonehengeState)):
+        table = get_tablebase(state.size)
+        if table is not None and table.value(state) is not None:
+            return tablebase_move(state, table)
+    return iterative_deepening_strategy(game, time_budget)
+
+
+if __name__ == "__main__":
+    for board_size in range(1, MAX_SIZE + 1):
+        print('Built', build_tablebase(board_size))
@@ -1,8 +1,7 @@
 """a"""
 from unittest.mock import patch
 from game_interface import playable_games, usable_strategies
-from strategy import Box, add_child
-from copy import deepcopy
+from strategy import Box, add_child, over_score
 from typing import Any
 from game import Game
 minimax_iterative_strategy = usable_strategies['mi']
@@ -33,23 +32,15 @@ def iterative_strategy_test(game: Game) -> Any:
     s = Stack()
     root = Box(game.current_state)
     s.add(root)
-    game0 = deepcopy(game)
     while not s.is_empty():
         cur = s.remove()
-        if game0.is_over(cur.state):
-            player = cur.state.get_current_player_name()
-            opponent = 'p1' if player == 'p2' else 'p2'
-            game0.current_state = cur.state
-            if game0.is_winner(player):
-                cur.highest_score = 1
-            elif game0.is_winner(opponent):
-                cur.highest_score = -1
-            else:
-                cur.highest_score = 0
+        score = over_score(cur.state)
+        if score is not None:
+            cur.highest_score = score
         else:
             if cur.children == []:
                 s.add(cur)
-                add_child(cur, s, game)
+                add_child(cur, s)
             else:
                 cur.highest_score = max([-1 * child.highest_score
                                          for child in cur.children])
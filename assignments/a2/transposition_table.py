@@ -0,0 +1,171 @@
+"""
+A bounded transposition table used by the strategies to remember the score
+of game states that have already been searched.
+"""
+from collections import OrderedDict
+from sys import getsizeof
+from typing import Any, Hashable, Optional
+
+
+class TranspositionTable:
+    """
+    A cache from state keys (see GameState.state_key) to scores. Once the
+    table holds more than max_entries entries or more than max_bytes bytes,
+    the least recently used entries are evicted.
+
+    max_entries - the most entries kept, or None for no limit
+    max_bytes - the most bytes (approximately) kept, or None for no limit
+    hits - the number of lookups that found their key
+    misses - the number of lookups that did not find their key
+    """
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    hits: int
+    misses: int
+
+    def __init__(self, max_entries: Optional[int] = 1000000,
+                 max_bytes: Optional[int] = None) -> None:
+        """
+        Initialize an empty TranspositionTable bounded by max_entries and
+        max_bytes.
+
+        >>> t = TranspositionTable(max_entries=10)
+        >>> len(t)
+        0
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._storage = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries in self.
+        """
+        return len(self._storage)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Return whether key is in self, without counting it as a lookup.
+        """
+        return key in self._storage
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the value stored for key, or default if there is none, and
+        mark key as the most recently used entry.
+
+        >>> t = TranspositionTable()
+        >>> t.put((True, 5), 1)
+        >>> t.get((True, 5))
+        1
+        >>> t.get((False, 5)) is None
+        True
+        """
+        if key not in self._storage:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._storage.move_to_end(key)
+        return self._storage[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store value for key, evicting the least recently used entries if self
+        grows beyond its bounds.
+
+        >>> t = TranspositionTable(max_entries=2)
+        >>> t.put('a', 1)
+        >>> t.put('b', 0)
+        >>> t.get('a')
+        1
+        >>> t.put('c', -1)
+        >>> 'b' in t
+        False
+        >>> len(t)
+        2
+        """
+        if key in self._storage:
+            self._bytes -= entry_size(key, self._storage.pop(key))
+        self._storage[key] = value
+        self._bytes += entry_size(key, value)
+        while self._storage and self._over_limit():
+            old_key, old_value = self._storage.popitem(last=False)
+            self._bytes -= entry_size(old_key, old_value)
+
+    def _over_limit(self) -> bool:
+        """
+        Return whether self holds more entries or bytes than allowed.
+        """
+        return ((self.max_entries is not None
+                 and len(self._storage) > self.max_entries)
+                or (self.max_bytes is not None
+                    and self._bytes > self.max_bytes))
+
+    def size_in_bytes(self) -> int:
+        """
+        Return the approximate number of bytes used by the keys and values
+        in self.
+        """
+        return self._bytes
+
+    def clear(self) -> None:
+        """
+        Remove every entry from self and reset its statistics.
+        """
+        self._storage.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self) -> float:
+        """
+        Return the fraction of lookups on self that found their key.
+
+        >>> t = TranspositionTable()
+        >>> t.hit_rate()
+        0.0
+        >>> t.put(1, 1)
+        >>> _ = t.get(1), t.get(2), t.get(1), t.get(1)
+        >>> t.hit_rate()
+        0.75
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of self.
+
+        >>> print(TranspositionTable())
+        TranspositionTable: 0 entries, 0 bytes, hit rate 0.0%
+        """
+        r = "TranspositionTable: {} entries, {} bytes, hit rate {:.1%}"
+        return r.format(len(self), self._bytes, self.hit_rate())
+
+
+def entry_size(key: Any, value: Any) -> int:
+    """
+    Return the approximate number of bytes used by key and value, following
+    the elements of tuples.
+
+    >>> entry_size((), 1) == getsizeof(()) + getsizeof(1)
+    True
+    """
+    return _deep_size(key) + _deep_size(value)
+
+
+def _deep_size(obj: Any) -> int:
+    """
+    Return the size of obj in bytes, including the elements of tuples.
+    """
+    if isinstance(obj, tuple):
+        return getsizeof(obj) + sum(_deep_size(item) for item in obj)
+    return getsizeof(obj)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
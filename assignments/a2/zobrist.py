@@ -0,0 +1,94 @@
+"""
+Zobrist hashing for Stonehenge states.
+
+A Zobrist hash is the XOR of one random 64-bit key for each claimed cell or
+ley-line marker (one key per position and player), plus a key for whose
+turn it is. Claiming a cell or a marker only XORs in its key, so a state's
+hash is found from its parent's hash in constant time.
+
+The keys come from a random generator seeded with the side length, so every
+process computes the same hashes and they can key shared or on-disk caches.
+
+A state also has one hash for each symmetry of the board: the hash of the
+state the symmetry moves it to. The smallest of them is the same for all
+the symmetric images of a state.
+"""
+from functools import lru_cache
+from random import Random
+from typing import List, Tuple
+from stonehenge_geometry import symmetries
+
+# The key XORed in when it is player 1's turn.
+TURN_KEY = Random('stonehenge turn').getrandbits(64)
+
+
+@lru_cache(maxsize=None)
+def position_keys(size: int) -> Tuple[Tuple[int, int], ...]:
+    """
+    Return the keys of players 1 and 2 for each cell and then each ley-line
+    marker of a board with side length size.
+
+    >>> keys = position_keys(2)
+    >>> len(keys), keys == position_keys(2), keys[0][0] < 2 ** 64
+    (16, True, True)
+    """
+    generator = Random('stonehenge {}'.format(size))
+    return tuple((generator.getrandbits(64), generator.getrandbits(64))
+                 for _ in symmetries(size)[0])
+
+
+@lru_cache(maxsize=None)
+def symmetric_keys(size: int) -> Tuple[Tuple[Tuple[int, ...], ...], ...]:
+    """
+    Return, for each cell and then each ley-line marker of a board with side
+    length size, and each player (1 and 2), the tuple of keys to XOR into
+    each of the board's symmetric hashes when that player claims it.
+    """
+    keys = position_keys(size)
+    images = [{source: position for position, source in enumerate(symmetry)}
+              for symmetry in symmetries(size)]
+    return tuple(tuple(tuple(keys[image[position]][player]
+                             for image in images)
+                       for player in range(2))
+                 for position in range(len(keys)))
+
+
+def zobrist_hashes(size: int, p1_turn: bool,
+                   symbols: List[str]) -> Tuple[int, ...]:
+    """
+    Return the hashes, one for each symmetry of a board with side length
+    size, of the state where it is p1's turn iff p1_turn, and whose cells
+    and then ley-line markers are symbols.
+
+    >>> hashes = zobrist_hashes(1, True, ['1', 'B', 'C', '1', '@', '@',
+    ...                                   '@', '@', '1'])
+    >>> len(hashes)
+    6
+    """
+    keys = symmetric_keys(size)
+    hashes = [TURN_KEY if p1_turn else 0] * len(keys[0][0])
+    for position, symbol in enumerate(symbols):
+        if symbol in ('1', '2'):
+            hashes = [hash_ ^ key for hash_, key
+                      in zip(hashes, keys[position][int(symbol) - 1])]
+    return tuple(hashes)
+
+
+def update_hashes(hashes: Tuple[int, ...], size: int, player: str,
+                  positions: List[int]) -> Tuple[int, ...]:
+    """
+    Return hashes after player ('1' or '2') claims the cells and ley-line
+    markers at positions and the turn passes to the other player.
+    """
+    keys = symmetric_keys(size)
+    player_index = int(player) - 1
+    new_hashes = [hash_ ^ TURN_KEY for hash_ in hashes]
+    for position in positions:
+        new_hashes = [hash_ ^ key for hash_, key
+                      in zip(new_hashes, keys[position][player_index])]
+    return tuple(new_hashes)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")